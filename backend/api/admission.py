@@ -0,0 +1,80 @@
+# backend/api/admission.py
+
+"""
+Admission control for model inference.
+
+Only INFERENCE_MAX_CONCURRENCY requests may run the emotion model at once.
+Up to INFERENCE_MAX_QUEUE more may wait, each for at most
+INFERENCE_QUEUE_TIMEOUT seconds. Anything beyond that is rejected right
+away with InferenceRejected, so the worker thread is freed for cheap
+endpoints (auth, watchlist) instead of piling up behind the model.
+RecommendationView turns a rejection into a degraded answer or a fast 503.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from . import metrics
+
+
+class InferenceRejected(Exception):
+    def __init__(self, reason):
+        super().__init__(f"Inference rejected: {reason}")
+        self.reason = reason
+
+
+class AdmissionGate:
+    def __init__(self, max_concurrency, max_queue, timeout):
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._waiting = 0
+
+    @property
+    def waiting(self):
+        return self._waiting
+
+    @contextmanager
+    def admit(self):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                if self._waiting >= self.max_queue:
+                    metrics.INFERENCE_REJECTED.inc('queue_full')
+                    raise InferenceRejected('queue_full')
+                self._waiting += 1
+            start = time.perf_counter()
+            try:
+                acquired = self._slots.acquire(timeout=self.timeout)
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+                metrics.STAGE_LATENCY.observe(time.perf_counter() - start, 'inference_queue')
+            if not acquired:
+                metrics.INFERENCE_REJECTED.inc('deadline')
+                raise InferenceRejected('deadline')
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+
+_gate = None
+_gate_lock = threading.Lock()
+
+
+def inference_gate():
+    """The process-wide gate, built from settings on first use."""
+    global _gate
+    if _gate is None:
+        with _gate_lock:
+            if _gate is None:
+                _gate = AdmissionGate(
+                    settings.INFERENCE_MAX_CONCURRENCY,
+                    settings.INFERENCE_MAX_QUEUE,
+                    settings.INFERENCE_QUEUE_TIMEOUT,
+                )
+    return _gate
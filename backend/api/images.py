@@ -0,0 +1,160 @@
+# backend/api/images.py
+
+"""
+Resized variants of profile pictures.
+
+After a new picture is saved, `schedule_variants()` queues a job on a small
+local thread pool (off the request thread) that renders each size in
+PROFILE_PICTURE_VARIANTS as WebP and JPEG. Files are named by a hash of
+their content, e.g. profile_pics/alice/variants/thumbnail-3fa2c1d09b7e.webp,
+so they never change once written and can be served with a long cache
+lifetime.
+
+The result is recorded in Profile.picture_variants:
+    {"source": "<original file name>",
+     "thumbnail": {"webp": "<file name>", "jpeg": "<file name>"}, ...}
+"""
+
+import hashlib
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from .models import Profile
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+
+# (profile id, picture name) of jobs queued or running in this process
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.PROFILE_PICTURE_WORKERS, thread_name_prefix='profile-variants'
+        )
+    return _executor
+
+
+def needs_variants(profile):
+    return bool(profile.profile_picture) and \
+        (profile.picture_variants or {}).get('source') != profile.profile_picture.name
+
+
+def schedule_variants(profile):
+    """
+    Queues variant generation once the surrounding transaction commits,
+    unless a job for the same picture is already queued or running.
+    """
+    job = (profile.pk, profile.profile_picture.name)
+
+    def submit():
+        with _in_flight_lock:
+            if job in _in_flight:
+                return
+            _in_flight.add(job)
+        if settings.PROFILE_PICTURE_VARIANTS_ASYNC:
+            _get_executor().submit(_run_job, job)
+        else:
+            try:
+                generate_variants(job[0])
+            finally:
+                with _in_flight_lock:
+                    _in_flight.discard(job)
+
+    transaction.on_commit(submit)
+
+
+def _run_job(job):
+    profile_id = job[0]
+    # Worker threads get their own DB connection; don't leak it between jobs.
+    close_old_connections()
+    try:
+        generate_variants(profile_id)
+    except Exception as e:
+        print(f"Error generating picture variants for profile {profile_id}: {e}")
+    finally:
+        with _in_flight_lock:
+            _in_flight.discard(job)
+        close_old_connections()
+
+
+def _render(image, size, fmt):
+    pil_format, options = FORMATS[fmt]
+    resized = ImageOps.fit(image, size, Image.Resampling.LANCZOS)
+    buffer = BytesIO()
+    resized.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def generate_variants(profile_id):
+    profile = Profile.objects.select_related('user').get(pk=profile_id)
+    if not needs_variants(profile):
+        return
+    source = profile.profile_picture
+    source_name = source.name
+    storage = source.storage
+    directory = posixpath.join(posixpath.dirname(source_name), 'variants')
+
+    with storage.open(source_name, 'rb') as f:
+        image = Image.open(f)
+        # Honour the camera's rotation flag, and drop alpha/palette for JPEG
+        image = ImageOps.exif_transpose(image).convert('RGB')
+
+    variants = {'source': source_name}
+    for variant, size in settings.PROFILE_PICTURE_VARIANTS.items():
+        variants[variant] = {}
+        for fmt in FORMATS:
+            data = _render(image, size, fmt)
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            name = posixpath.join(directory, f'{variant}-{digest}.{fmt}')
+            if not storage.exists(name):
+                name = storage.save(name, ContentFile(data))
+            variants[variant][fmt] = name
+
+    # Only record the variants if the picture wasn't replaced while we worked
+    updated = Profile.objects.filter(pk=profile_id, profile_picture=source_name) \
+        .update(picture_variants=variants)
+    if updated:
+        _delete_stale_files(storage, profile.picture_variants or {}, variants)
+
+
+def _delete_stale_files(storage, old_variants, new_variants):
+    def files(variants):
+        return {
+            name
+            for key, value in variants.items() if key != 'source'
+            for name in value.values()
+        }
+    for name in files(old_variants) - files(new_variants):
+        storage.delete(name)
+
+
+def variant_urls(profile, request=None):
+    """{'thumbnail': {'webp': url, 'jpeg': url}, ...} or {} while variants are being generated."""
+    variants = profile.picture_variants or {}
+    if not profile.profile_picture or variants.get('source') != profile.profile_picture.name:
+        return {}
+    storage = profile.profile_picture.storage
+    urls = {}
+    for variant, files in variants.items():
+        if variant == 'source':
+            continue
+        urls[variant] = {}
+        for fmt, name in files.items():
+            url = storage.url(name)
+            urls[variant][fmt] = request.build_absolute_uri(url) if request else url
+    return urls
@@ -0,0 +1,40 @@
+# backend/api/lexicon.py
+
+"""
+A tiny keyword lexicon for the 7 emotions the recommender uses.
+It is only a fallback for when the model is overloaded (see api/admission.py):
+far less accurate, but it costs microseconds.
+"""
+
+import re
+
+import numpy as np
+
+EMOTION_LABELS = ["joy", "love", "sadness", "fear", "anger", "surprise", "disgust"]
+
+LEXICON = {
+    "joy": ["happy", "joy", "joyful", "glad", "cheerful", "excited", "fun", "funny", "laugh", "great", "good", "upbeat"],
+    "love": ["love", "loving", "romantic", "romance", "crush", "sweet", "caring", "affection", "date"],
+    "sadness": ["sad", "down", "depressed", "lonely", "cry", "crying", "heartbroken", "blue", "miserable", "grief"],
+    "fear": ["scared", "afraid", "fear", "nervous", "anxious", "worried", "terrified", "creepy", "spooky", "horror"],
+    "anger": ["angry", "mad", "furious", "annoyed", "irritated", "rage", "frustrated", "hate"],
+    "surprise": ["surprised", "surprise", "shocked", "curious", "wow", "unexpected", "mystery", "twist"],
+    "disgust": ["disgusted", "gross", "sick", "awkward", "embarrassed", "confused", "weird"],
+}
+
+_WORD_TO_EMOTION = {word: emotion for emotion, words in LEXICON.items() for word in words}
+
+
+def lexicon_emotion_vector(text):
+    """
+    Normalized 7-dim emotion vector in EMOTION_LABELS order from keyword
+    counts, or None if no keyword matched.
+    """
+    vec = np.zeros(len(EMOTION_LABELS))
+    for word in re.findall(r"[a-z']+", text.lower()):
+        emotion = _WORD_TO_EMOTION.get(word)
+        if emotion:
+            vec[EMOTION_LABELS.index(emotion)] += 1
+    if not vec.any():
+        return None
+    return vec / vec.sum()
@@ -0,0 +1,84 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.models import Profile, WatchlistItem
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import UserSerializer, WatchlistItemSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures serializing + rendering of large watchlist and admin user list responses, "
+        "with all fields and with ?fields=, on the stock and the orjson-backed renderer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--watchlist-items', type=int, default=5000)
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per measurement; the best is reported.")
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        self.factory = APIRequestFactory()
+        if orjson is None:
+            self.stdout.write(self.style.WARNING("orjson is not installed; FastJSONRenderer uses the stock path."))
+
+        # Unsaved instances: nothing is written to the database, and no query
+        # is run, so only serialization and rendering are measured.
+        now = timezone.now()
+        owner = User(id=1, username='owner')
+        items = [
+            WatchlistItem(id=i, user=owner, movie_id=i, title=f'Movie {i}', poster_path=f'/{i}.jpg', added_at=now)
+            for i in range(1, options['watchlist_items'] + 1)
+        ]
+        users = []
+        for i in range(1, options['users'] + 1):
+            user = User(id=i, username=f'user{i}', email=f'user{i}@example.com', date_joined=now)
+            Profile(id=i, user=user, bio='Loves movies', favorite_genre='Drama')
+            users.append(user)
+
+        self.compare(f"watchlist, {len(items)} items", WatchlistItemSerializer, items, 'movie_id,title')
+        self.compare(f"admin users, {len(users)} users", UserSerializer, users, 'id,username')
+
+        payload = {
+            'user_mood_text': 'happy and excited',
+            'detected_emotion_profile': {e: 1 / 7 for e in ['joy', 'love', 'sadness', 'fear', 'anger', 'surprise', 'disgust']},
+            'recommendations': [
+                {'id': i, 'title': f'Movie {i}', 'overview': 'An overview. ' * 20, 'poster_path': f'/{i}.jpg',
+                 'release_date': '2001-01-01', 'vote_average': 7.5, 'similarity_score': 0.9 - i / 100}
+                for i in range(10)
+            ],
+        }
+        stock = self.best(lambda: JSONRenderer().render(payload))
+        fast = self.best(lambda: FastJSONRenderer().render(payload))
+        self.stdout.write(f"{'recommendation payload':<30} render {stock * 1e6:.1f} -> {fast * 1e6:.1f} us")
+
+    def compare(self, label, serializer_class, objects, fields):
+        for query in ({}, {'fields': fields}):
+            request = Request(self.factory.get('/', query, HTTP_HOST='localhost'))
+            serialize = lambda: serializer_class(objects, many=True, context={'request': request}).data
+            data = serialize()
+            serialize_time = self.best(serialize)
+            stock = self.best(lambda: JSONRenderer().render(data))
+            fast = self.best(lambda: FastJSONRenderer().render(data))
+            size = len(FastJSONRenderer().render(data)) / 1024
+            self.stdout.write(
+                f"{label:<30} {('fields=' + fields) if query else 'all fields':<24} "
+                f"serialize {serialize_time * 1000:7.1f} ms  render {stock * 1000:6.1f} -> {fast * 1000:5.1f} ms  "
+                f"({size:.0f} KiB)"
+            )
+            label = ''
+
+    def best(self, func):
+        timings = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
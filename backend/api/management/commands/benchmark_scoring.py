@@ -0,0 +1,68 @@
+import os
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from api.scoring import ScoringEngine
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures similarity-scoring throughput on synthetic catalogs: one in-memory "
+        "shard versus mmap'd shards scored in parallel."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000, 10_000_000],
+                            help="Catalog sizes to test (default: 1000000 10000000).")
+        parser.add_argument('--shard-rows', type=int, default=1_000_000)
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--executor', choices=['thread', 'process'], default='thread')
+        parser.add_argument('--queries', type=int, default=20, help="Timed queries per configuration.")
+        parser.add_argument('--batch', type=int, default=1, help="Query vectors scored per call.")
+        parser.add_argument('--k', type=int, default=10)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        queries = rng.random((options['batch'], 7), dtype=np.float32)
+        self.stdout.write(
+            f"workers={options['workers']} executor={options['executor']} "
+            f"shard_rows={options['shard_rows']} batch={options['batch']} k={options['k']}"
+        )
+
+        for rows in options['rows']:
+            with tempfile.TemporaryDirectory() as directory:
+                shard_rows = options['shard_rows']
+                blocks = (
+                    rng.random((min(shard_rows, rows - start), 7), dtype=np.float32)
+                    for start in range(0, rows, shard_rows)
+                )
+                ScoringEngine.write_shards(blocks, directory)
+
+                sharded = ScoringEngine.open(directory, workers=options['workers'], executor=options['executor'])
+                single = ScoringEngine([np.concatenate([np.asarray(s) for s in sharded.shards])])
+
+                results = {}
+                for label, engine in (('single shard', single), ('sharded', sharded)):
+                    engine.top_k_batch(queries, options['k'])  # warm up (page cache, pool start)
+                    start = time.perf_counter()
+                    for _ in range(options['queries']):
+                        engine.top_k_batch(queries, options['k'])
+                    elapsed = time.perf_counter() - start
+                    calls_per_sec = options['queries'] / elapsed
+                    results[label] = calls_per_sec
+                    self.stdout.write(
+                        f"{rows:>11,} rows  {label:<13} {calls_per_sec * options['batch']:8.1f} queries/s  "
+                        f"{calls_per_sec * rows * options['batch'] / 1e6:9.1f} M rows/s  "
+                        f"{elapsed / options['queries'] * 1000:8.1f} ms/call"
+                    )
+                sharded.close()
+
+                # Sanity check: both layouts find the same neighbours
+                _, single_scores = single.top_k_batch(queries, options['k'])
+                _, sharded_scores = ScoringEngine.open(directory).top_k_batch(queries, options['k'])
+                if not np.allclose(single_scores, sharded_scores, atol=1e-5):
+                    self.stderr.write(self.style.ERROR("Sharded and single-shard results differ!"))
+                self.stdout.write(f"{'':>11}        speedup x{results['sharded'] / results['single shard']:.2f}")
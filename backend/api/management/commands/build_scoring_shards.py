@@ -0,0 +1,48 @@
+import os
+import pickle
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.scoring import ScoringEngine
+
+ML_MODEL_DIR = os.path.join(settings.BASE_DIR, 'api/ml_model')
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes movie_emotion_matrix.pkl as mmap-able shard files plus a manifest, in "
+        "movies_data.pkl row order. Point SCORING_SHARD_DIR at the output to use them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--out', default=settings.SCORING_SHARD_DIR,
+                            help="Output directory (default: SCORING_SHARD_DIR).")
+        parser.add_argument('--shard-rows', type=int, default=settings.SCORING_SHARD_ROWS,
+                            help="Rows per shard (default: SCORING_SHARD_ROWS).")
+
+    def handle(self, *args, **options):
+        out, shard_rows = options['out'], options['shard_rows']
+        if not out:
+            raise CommandError("Give an output directory with --out or set SCORING_SHARD_DIR.")
+        if shard_rows < 1:
+            raise CommandError("--shard-rows must be positive.")
+
+        with open(os.path.join(ML_MODEL_DIR, 'movies_data.pkl'), 'rb') as f:
+            catalog_rows = len(pickle.load(f))
+        with open(os.path.join(ML_MODEL_DIR, 'movie_emotion_matrix.pkl'), 'rb') as f:
+            matrix = np.asarray(pickle.load(f))
+        # The view maps score row i to movies_df row i
+        if len(matrix) != catalog_rows:
+            raise CommandError(
+                f"movie_emotion_matrix.pkl has {len(matrix)} rows but movies_data.pkl has {catalog_rows} movies."
+            )
+
+        # write_shards normalizes and saves one block at a time, in this order
+        blocks = (matrix[start:start + shard_rows] for start in range(0, len(matrix), shard_rows))
+        ScoringEngine.write_shards(blocks, out)
+        shards = -(-len(matrix) // shard_rows)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {len(matrix)} rows in {shards} shard(s) to {out}. Set SCORING_SHARD_DIR={out} to use them."
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from api import images
+from api.models import Profile
+
+
+class Command(BaseCommand):
+    help = "Renders missing avatar/thumbnail variants for existing profile pictures."
+
+    def handle(self, *args, **options):
+        generated = 0
+        for profile in Profile.objects.exclude(profile_picture='').exclude(profile_picture=None).iterator():
+            if images.needs_variants(profile):
+                images.generate_variants(profile.pk)
+                generated += 1
+        self.stdout.write(self.style.SUCCESS(f"Generated variants for {generated} profile(s)."))
@@ -0,0 +1,101 @@
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.models import MovieDetails
+from api.tmdb_service import fetch_movie_details, fresh_cutoff, store_movie_details
+
+
+class RateLimiter:
+    """Spaces out calls so that at most `rate` start per second, across threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def load_catalog_ids():
+    # The same catalog the recommender ranks (see the asset loading in api/views.py)
+    movies_data_path = os.path.join(settings.BASE_DIR, 'api/ml_model/movies_data.pkl')
+    with open(movies_data_path, 'rb') as f:
+        movies_df = pickle.load(f)
+    return [int(movie_id) for movie_id in movies_df['id']]
+
+
+class Command(BaseCommand):
+    help = (
+        "Fetches missing or stale TMDb details for every catalog movie into the local "
+        "store, so recommendations never wait on TMDb. Safe to interrupt and re-run: "
+        "each batch is saved as it completes and fresh rows are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help="Maximum number of TMDb requests in flight (default: 8).")
+        parser.add_argument('--rate', type=float, default=30.0,
+                            help="Maximum TMDb requests started per second; 0 = unlimited (default: 30).")
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help="Movies fetched and written to the database per batch (default: 200).")
+        parser.add_argument('--limit', type=int, default=None,
+                            help="Only hydrate the first N movies that need it.")
+
+    def handle(self, *args, **options):
+        if not os.getenv('TMDB_API_KEY'):
+            self.stderr.write(self.style.ERROR("TMDB_API_KEY is not set."))
+            return
+
+        catalog_ids = list(dict.fromkeys(load_catalog_ids()))
+        fresh = set(
+            MovieDetails.objects.filter(movie_id__in=catalog_ids, fetched_at__gte=fresh_cutoff())
+            .values_list('movie_id', flat=True)
+        )
+        todo = [movie_id for movie_id in catalog_ids if movie_id not in fresh]
+        if options['limit'] is not None:
+            todo = todo[:options['limit']]
+        self.stdout.write(f"{len(catalog_ids)} catalog movies, {len(fresh)} fresh, {len(todo)} to fetch.")
+
+        limiter = RateLimiter(options['rate'])
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=options['concurrency'])
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        def fetch(movie_id):
+            limiter.wait()
+            return fetch_movie_details(movie_id, session=session)
+
+        stored = failed = 0
+        started = time.monotonic()
+        batch_size = options['batch_size']
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            for start in range(0, len(todo), batch_size):
+                batch = todo[start:start + batch_size]
+                results = [details for details in executor.map(fetch, batch) if details]
+                # Writes happen on this thread, one bulk upsert per batch
+                if results:
+                    store_movie_details(results)
+                stored += len(results)
+                failed += len(batch) - len(results)
+                self.stdout.write(f"  {start + len(batch)}/{len(todo)} processed ({failed} failed)")
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored details for {stored} movies in {elapsed:.1f}s; {failed} failed (re-run to retry)."
+        ))
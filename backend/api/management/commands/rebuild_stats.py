@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api import stats
+
+
+class Command(BaseCommand):
+    help = "Recomputes the admin dashboard aggregate tables from the User and WatchlistItem tables."
+
+    def handle(self, *args, **options):
+        stats.rebuild()
+        summary = stats.dashboard_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt dashboard stats: {summary['total_users']} users, "
+            f"{summary['total_watchlist_items']} watchlist items."
+        ))
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api import warmup
+
+
+class Command(BaseCommand):
+    help = (
+        "Precomputes recommendations for the most frequently requested moods into the cache. "
+        "Useful with a shared cache backend; workers also do this on startup."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=settings.RECOMMENDATION_WARMUP_TOP_N,
+                            help="Number of most popular moods to warm.")
+        parser.add_argument('--time-budget', type=float, default=settings.RECOMMENDATION_WARMUP_TIME_BUDGET,
+                            help="Stop after this many seconds.")
+
+    def handle(self, *args, **options):
+        warmup.flush()
+        warmup.warm_popular_moods(options['top'], options['time_budget'], log=self.stdout.write)
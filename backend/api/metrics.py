@@ -0,0 +1,201 @@
+# backend/api/metrics.py
+
+"""
+Lightweight in-process metrics, exposed in Prometheus text format at /metrics.
+
+- RequestMetricsMiddleware (api/middleware.py) records latency, status and DB
+  query counts for every request, labelled by URL name.
+- `timer(stage)` times a block of code (e.g. model forward pass) and also
+  attaches it to the current request so it can be sent as a Server-Timing
+  header.
+- `record_cache(name, hit)` counts cache hits/misses.
+
+Metrics live in the memory of each worker process; with several workers,
+Prometheus scrapes each one (or sums them) like any other per-process target.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, value in items:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labelvalues -> [per-bucket counts (last one is +Inf), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labelvalues):
+        series = self._series.get(labelvalues)
+        return series[2] if series else 0
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((labels, (list(s[0]), s[1], s[2])) for labels, s in self._series.items())
+        for labelvalues, (bucket_counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, labelvalues, [('le', _format_value(bound))])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+# ==============================================================================
+#  THE METRICS WE EXPORT
+# ==============================================================================
+REQUEST_LATENCY = Histogram(
+    'cinesense_http_request_duration_seconds',
+    'Time spent handling a request, by endpoint (URL name) and method.',
+    labelnames=('endpoint', 'method'),
+)
+REQUESTS = Counter(
+    'cinesense_http_requests_total',
+    'Requests handled, by endpoint, method and status code.',
+    labelnames=('endpoint', 'method', 'status'),
+)
+REQUEST_DB_QUERIES = Histogram(
+    'cinesense_http_request_db_queries',
+    'Number of database queries executed per request, by endpoint.',
+    labelnames=('endpoint',),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+STAGE_LATENCY = Histogram(
+    'cinesense_stage_duration_seconds',
+    'Time spent in named stages of the recommendation pipeline (tokenize, model_forward, ...).',
+    labelnames=('stage',),
+)
+CACHE_REQUESTS = Counter(
+    'cinesense_cache_requests_total',
+    'Cache lookups, by cache name and result (hit/miss).',
+    labelnames=('cache', 'result'),
+)
+INFERENCE_REJECTED = Counter(
+    'cinesense_inference_rejected_total',
+    'Requests turned away by inference admission control, by reason (queue_full/deadline).',
+    labelnames=('reason',),
+)
+DEGRADED_RESPONSES = Counter(
+    'cinesense_recommendation_degraded_total',
+    'Recommendation responses served without the model, by fallback (lexicon/popular/unavailable).',
+    labelnames=('fallback',),
+)
+
+REGISTRY = [
+    REQUEST_LATENCY, REQUESTS, REQUEST_DB_QUERIES, STAGE_LATENCY, CACHE_REQUESTS,
+    INFERENCE_REJECTED, DEGRADED_RESPONSES,
+]
+
+
+def render():
+    """Returns all metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# ==============================================================================
+#  PER-REQUEST TIMINGS (for the Server-Timing header)
+# ==============================================================================
+_request_timings = ContextVar('request_timings', default=None)
+
+
+def start_request():
+    """
+    Called by the middleware. Returns the list that timer()/record_cache()
+    append (name, seconds or None, description or None) entries to, and a
+    token for end_request().
+    """
+    timings = []
+    return timings, _request_timings.set(timings)
+
+
+def end_request(token):
+    _request_timings.reset(token)
+
+
+@contextmanager
+def timer(stage):
+    """Times the enclosed block as `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.observe(elapsed, stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, elapsed, None))
+
+
+def record_cache(cache, hit):
+    result = 'hit' if hit else 'miss'
+    CACHE_REQUESTS.inc(cache, result)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((f'cache-{cache}', None, result))
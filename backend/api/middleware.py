@@ -0,0 +1,90 @@
+# backend/api/middleware.py
+
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from . import metrics, profiling
+
+
+class RequestMetricsMiddleware:
+    """
+    Records per-endpoint latency, status codes and DB query counts into
+    api/metrics.py, and optionally adds a `Server-Timing` header with the
+    total time, DB time and any stages timed with `metrics.timer()`.
+
+    It should sit at the top of MIDDLEWARE so the session/auth queries made
+    by later middleware are included.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        db = {'queries': 0, 'seconds': 0.0}
+
+        def count_query(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                db['queries'] += 1
+                db['seconds'] += time.perf_counter() - start
+
+        timings, token = metrics.start_request()
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(count_query):
+                response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        elapsed = time.perf_counter() - start
+
+        # Label by URL name, never by raw path, to keep the number of series bounded
+        match = request.resolver_match
+        endpoint = (match.url_name or match.view_name) if match else 'unmatched'
+        metrics.REQUEST_LATENCY.observe(elapsed, endpoint, request.method)
+        metrics.REQUESTS.inc(endpoint, request.method, str(response.status_code))
+        metrics.REQUEST_DB_QUERIES.observe(db['queries'], endpoint)
+
+        if getattr(settings, 'METRICS_SERVER_TIMING', False):
+            response['Server-Timing'] = self.server_timing(elapsed, db, timings)
+        return response
+
+    @staticmethod
+    def server_timing(elapsed, db, timings):
+        entries = [
+            f'total;dur={elapsed * 1000:.1f}',
+            f'db;desc="{db["queries"]} queries";dur={db["seconds"] * 1000:.1f}',
+        ]
+        for name, seconds, description in timings:
+            entry = name
+            if description:
+                entry += f';desc="{description}"'
+            if seconds is not None:
+                entry += f';dur={seconds * 1000:.1f}'
+            entries.append(entry)
+        return ', '.join(entries)
+
+
+class ProfilingMiddleware:
+    """
+    Runs the view under a profiler when an admin has armed its endpoint
+    (see api/profiling.py). It must be the LAST entry in MIDDLEWARE: it
+    returns the view's response from process_view, so any middleware after
+    it would have its process_view skipped.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        endpoint = request.resolver_match.url_name
+        mode = profiling.claim(endpoint)
+        if mode is None:
+            return None
+        return profiling.run(endpoint, mode, view_func, request, *view_args, **view_kwargs)
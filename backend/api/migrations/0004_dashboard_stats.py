@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:46
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+from django.db.models.functions import TruncDate
+
+
+def populate_stats(apps, schema_editor):
+    # Seed the aggregate tables from existing data (same as `rebuild_stats`).
+    User = apps.get_model('auth', 'User')
+    WatchlistItem = apps.get_model('api', 'WatchlistItem')
+    StatCounter = apps.get_model('api', 'StatCounter')
+    DailySignupCount = apps.get_model('api', 'DailySignupCount')
+    MovieSaveCount = apps.get_model('api', 'MovieSaveCount')
+
+    StatCounter.objects.bulk_create([
+        StatCounter(name='total_users', value=User.objects.count()),
+        StatCounter(name='total_watchlist_items', value=WatchlistItem.objects.count()),
+    ])
+    signups = User.objects.annotate(day=TruncDate('date_joined')).values('day').annotate(count=Count('id'))
+    DailySignupCount.objects.bulk_create(
+        [DailySignupCount(date=row['day'], count=row['count']) for row in signups]
+    )
+    movies = WatchlistItem.objects.values('movie_id') \
+        .annotate(count=Count('id'), title=Max('title'), poster_path=Max('poster_path'))
+    MovieSaveCount.objects.bulk_create([MovieSaveCount(**row) for row in movies], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_remove_profile_profile_picture_url_and_more'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySignupCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MovieSaveCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('movie_id', models.IntegerField(unique=True)),
+                ('title', models.CharField(max_length=200)),
+                ('poster_path', models.CharField(max_length=200)),
+                ('count', models.IntegerField(db_index=True, default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StatCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations
+
+
+# Indexes on auth_user backing the admin user list (UserListView):
+# keyset pagination on date_joined, the is_staff filter, and prefix search
+# on username/email. auth_user belongs to django.contrib.auth, so they are
+# created with SQL rather than Meta.indexes.
+INDEXES = {
+    'sqlite': [
+        ('api_auth_user_date_joined_idx', 'auth_user (date_joined, id)'),
+        ('api_auth_user_staff_joined_idx', 'auth_user (is_staff, date_joined, id)'),
+        # NOCASE lets SQLite use these for case-insensitive LIKE 'prefix%'
+        ('api_auth_user_username_nocase_idx', 'auth_user (username COLLATE NOCASE)'),
+        ('api_auth_user_email_nocase_idx', 'auth_user (email COLLATE NOCASE)'),
+    ],
+    'postgresql': [
+        ('api_auth_user_date_joined_idx', 'auth_user (date_joined, id)'),
+        ('api_auth_user_staff_joined_idx', 'auth_user (is_staff, date_joined, id)'),
+        # Django's istartswith compiles to UPPER(col) LIKE UPPER('prefix%') on PostgreSQL
+        ('api_auth_user_username_upper_idx', 'auth_user (UPPER(username) varchar_pattern_ops)'),
+        ('api_auth_user_email_upper_idx', 'auth_user (UPPER(email) varchar_pattern_ops)'),
+    ],
+}
+
+
+def create_indexes(apps, schema_editor):
+    for name, definition in INDEXES.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {definition}')
+
+
+def drop_indexes(apps, schema_editor):
+    for name, _ in INDEXES.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_dashboard_stats'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_profile_picture_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieDetails',
+            fields=[
+                ('movie_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(blank=True, max_length=200, null=True)),
+                ('overview', models.TextField(blank=True, null=True)),
+                ('poster_path', models.CharField(blank=True, max_length=200, null=True)),
+                ('release_date', models.CharField(blank=True, max_length=20, null=True)),
+                ('vote_average', models.FloatField(blank=True, null=True)),
+                ('fetched_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
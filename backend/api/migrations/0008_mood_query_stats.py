@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_movie_details'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MoodQueryStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mood_hash', models.CharField(max_length=40, unique=True)),
+                ('mood', models.TextField()),
+                ('count', models.BigIntegerField(db_index=True, default=0)),
+                ('last_seen', models.DateTimeField()),
+            ],
+        ),
+    ]
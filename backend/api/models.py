@@ -43,5 +43,90 @@ class Profile(models.Model):
     # `null=True` and `blank=True` make the picture optional.
     profile_picture = models.ImageField(upload_to=user_directory_path, null=True, blank=True)
 
+    # Resized copies of profile_picture, filled in by a background job
+    # (see api/images.py). Empty until the job for the current picture ran.
+    picture_variants = models.JSONField(default=dict, blank=True)
+
+    def __str__(self):
+        return f"{self.user.username}'s Profile"
+
+
+# ==============================================================================
+#  AGGREGATE TABLES FOR THE ADMIN DASHBOARD
+#  These are kept up to date incrementally by api/stats.py (driven from
+#  signals), so the dashboard never has to scan User or WatchlistItem.
+#  `python manage.py rebuild_stats` recomputes them from scratch.
+# ==============================================================================
+class StatCounter(models.Model):
+    # e.g. 'total_users', 'total_watchlist_items'
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+
+class DailySignupCount(models.Model):
+    date = models.DateField(unique=True)
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.date}: {self.count} new users"
+
+
+class MovieSaveCount(models.Model):
+    # How many watchlists currently contain this movie
+    movie_id = models.IntegerField(unique=True)
+    title = models.CharField(max_length=200)
+    poster_path = models.CharField(max_length=200)
+    count = models.IntegerField(default=0, db_index=True)
+
+    def __str__(self):
+        return f"{self.title}: saved {self.count} times"
+
+
+# ==============================================================================
+#  LOCAL COPY OF TMDb MOVIE DETAILS
+#  Read-through store used by tmdb_service.get_movie_details(), and filled
+#  ahead of time by `python manage.py hydrate_tmdb`.
+# ==============================================================================
+class MovieDetails(models.Model):
+    movie_id = models.IntegerField(primary_key=True)
+    title = models.CharField(max_length=200, null=True, blank=True)
+    overview = models.TextField(null=True, blank=True)
+    poster_path = models.CharField(max_length=200, null=True, blank=True)
+    release_date = models.CharField(max_length=20, null=True, blank=True)
+    vote_average = models.FloatField(null=True, blank=True)
+
+    # When the row was last refreshed from TMDb
+    fetched_at = models.DateTimeField(db_index=True)
+
+    def as_dict(self):
+        # Same shape tmdb_service has always returned
+        return {
+            'id': self.movie_id,
+            'title': self.title,
+            'overview': self.overview,
+            'poster_path': self.poster_path,
+            'release_date': self.release_date,
+            'vote_average': self.vote_average,
+        }
+
+    def __str__(self):
+        return f"TMDb details: {self.title} ({self.movie_id})"
+
+
+# ==============================================================================
+#  AGGREGATE LOG OF RECOMMENDATION QUERIES
+#  How often each normalized mood was asked for (no user link). Used to
+#  pre-compute the most popular ones at startup (see api/warmup.py).
+# ==============================================================================
+class MoodQueryStat(models.Model):
+    # sha1 of the normalized mood, so the unique index stays small
+    mood_hash = models.CharField(max_length=40, unique=True)
+    mood = models.TextField()
+    count = models.BigIntegerField(default=0, db_index=True)
+    last_seen = models.DateTimeField()
+
     def __str__(self):
-        return f"{self.user.username}'s Profile"
\ No newline at end of file
+        return f"'{self.mood}' asked {self.count} times"
@@ -0,0 +1,16 @@
+# backend/api/pagination.py
+
+from rest_framework.pagination import CursorPagination
+
+
+class UserCursorPagination(CursorPagination):
+    """
+    Keyset pagination for the admin user list.
+    Each page is `WHERE date_joined < <cursor> ORDER BY date_joined DESC LIMIT n`,
+    which stays fast on deep pages (unlike OFFSET) and is backed by the
+    auth_user(date_joined) index created in migration 0005.
+    """
+    ordering = ('-date_joined', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
@@ -0,0 +1,182 @@
+# backend/api/profiling.py
+
+"""
+On-demand profiling of live requests.
+
+An admin "arms" an endpoint (by URL name) for the next N requests through
+/api/admin/profiling/. ProfilingMiddleware then runs those requests' views
+under either:
+  - 'sampling': a background thread that samples the request thread's stack
+    every PROFILING_SAMPLE_INTERVAL seconds. Output is collapsed stacks
+    (`frame;frame;frame count`), ready for flamegraph.pl / speedscope.
+  - 'cprofile': the deterministic profiler. Output is a .pstats file for
+    `python -m pstats` / snakeviz.
+
+When nothing is armed the only cost per request is one dict truthiness check.
+Arming is per worker process: with several workers only the process that
+handled the admin request profiles its next N requests.
+"""
+
+import cProfile
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+
+MODES = ('sampling', 'cprofile')
+EXTENSIONS = {'sampling': '.collapsed', 'cprofile': '.pstats'}
+PROFILE_NAME_RE = re.compile(r'^[\w.-]+\.(collapsed|pstats)$')
+
+# endpoint (URL name) -> {'remaining': int, 'mode': str}
+_armed = {}
+_lock = threading.Lock()
+# Only one cProfile may be active per process (on Python 3.12+ a second one
+# raises ValueError), so concurrent armed requests don't all get profiled.
+_cprofile_lock = threading.Lock()
+
+
+# ==============================================================================
+#  ARMING
+# ==============================================================================
+def arm(endpoint, requests=1, mode='sampling'):
+    with _lock:
+        _armed[endpoint] = {'remaining': requests, 'mode': mode}
+
+
+def disarm(endpoint=None):
+    with _lock:
+        if endpoint is None:
+            _armed.clear()
+        else:
+            _armed.pop(endpoint, None)
+
+
+def armed():
+    with _lock:
+        return {endpoint: dict(state) for endpoint, state in _armed.items()}
+
+
+def claim(endpoint):
+    """
+    Returns the profiling mode if this request should be profiled (and
+    counts it against the armed budget), otherwise None. A 'cprofile'
+    claim holds the cProfile lock until run() returns; while another
+    request holds it, this one runs unprofiled and isn't counted.
+    """
+    if not _armed:
+        return None
+    with _lock:
+        state = _armed.get(endpoint)
+        if state is None:
+            return None
+        if state['mode'] == 'cprofile' and not _cprofile_lock.acquire(blocking=False):
+            return None
+        state['remaining'] -= 1
+        if state['remaining'] <= 0:
+            del _armed[endpoint]
+        return state['mode']
+
+
+# ==============================================================================
+#  RUNNING A PROFILE
+# ==============================================================================
+class _StackSampler(threading.Thread):
+    """Periodically records the stack of another thread as a collapsed string."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _profiles_dir():
+    path = settings.PROFILING_DIR
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _new_profile_path(endpoint, mode):
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    name = f'{endpoint}-{stamp}-{uuid.uuid4().hex[:8]}{EXTENSIONS[mode]}'
+    return os.path.join(_profiles_dir(), name)
+
+
+def run(endpoint, mode, func, *args, **kwargs):
+    """
+    Calls func(*args, **kwargs) under the chosen profiler and stores the
+    result. `mode` must come from claim().
+    """
+    if mode == 'cprofile':
+        try:
+            profiler = cProfile.Profile()
+            try:
+                return profiler.runcall(func, *args, **kwargs)
+            finally:
+                profiler.dump_stats(_new_profile_path(endpoint, mode))
+                _prune()
+        finally:
+            _cprofile_lock.release()
+
+    sampler = _StackSampler(threading.get_ident(), settings.PROFILING_SAMPLE_INTERVAL)
+    sampler.start()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        sampler.stop()
+        with open(_new_profile_path(endpoint, mode), 'w') as f:
+            for stack, count in sampler.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+        _prune()
+
+
+# ==============================================================================
+#  STORED PROFILES
+# ==============================================================================
+def list_profiles():
+    """Stored profiles, newest first."""
+    directory = _profiles_dir()
+    profiles = []
+    for name in os.listdir(directory):
+        if PROFILE_NAME_RE.match(name):
+            stat = os.stat(os.path.join(directory, name))
+            profiles.append({'name': name, 'size': stat.st_size, 'created': stat.st_mtime})
+    profiles.sort(key=lambda p: p['created'], reverse=True)
+    return profiles
+
+
+def profile_path(name):
+    """Absolute path of a stored profile, or None if the name is invalid/unknown."""
+    if not PROFILE_NAME_RE.match(name):
+        return None
+    path = os.path.join(_profiles_dir(), name)
+    return path if os.path.isfile(path) else None
+
+
+def _prune():
+    for profile in list_profiles()[settings.PROFILING_MAX_STORED:]:
+        try:
+            os.remove(os.path.join(_profiles_dir(), profile['name']))
+        except FileNotFoundError:
+            pass
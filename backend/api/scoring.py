@@ -0,0 +1,164 @@
+# backend/api/scoring.py
+
+"""
+Sharded cosine-similarity scoring over the movie emotion matrix.
+
+The matrix is split into shards of rows. Each shard stores L2-normalized
+float32 rows, so a cosine score is a single mat-vec product. Shards are
+scored in parallel and each returns only its own top-k, and the small
+per-shard results are merged with a heap. That keeps memory traffic linear
+in catalog size and the merge cost independent of it.
+
+Shards can live in memory (ScoringEngine.from_matrix) or in .npy files
+opened with mmap (ScoringEngine.open). The mmap'd form lets several worker
+processes share one copy through the page cache and lets catalogs larger
+than RAM be scored.
+"""
+
+import heapq
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+MANIFEST = 'manifest.json'
+
+
+def _normalize_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0  # all-zero rows score 0, as with sklearn's cosine_similarity
+    return matrix / norms
+
+
+def _normalize_queries(queries):
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    norms = np.linalg.norm(queries, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return queries / norms
+
+
+def _shard_top_k(shard, offset, queries, k):
+    """Top-k (global indices, scores) of one shard for each query, unsorted."""
+    scores = queries @ shard.T  # (n_queries, rows): one contiguous row per query
+    k = min(k, scores.shape[1])
+    if k < scores.shape[1]:
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    return top + offset, np.take_along_axis(scores, top, axis=1)
+
+
+# Shards opened inside process-pool workers, keyed by path
+_process_shards = {}
+
+
+def _score_shard_file(path, offset, queries, k):
+    shard = _process_shards.get(path)
+    if shard is None:
+        shard = _process_shards[path] = np.load(path, mmap_mode='r')
+    return _shard_top_k(shard, offset, queries, k)
+
+
+class ScoringEngine:
+    def __init__(self, shards, paths=None, workers=1, executor='thread'):
+        """
+        shards:   list of normalized float32 row blocks (arrays or memmaps).
+        paths:    the .npy file of each shard; required for executor='process'.
+        workers:  size of the pool used when there is more than one shard.
+        """
+        self.shards = shards
+        self.paths = paths
+        self.offsets = np.cumsum([0] + [len(shard) for shard in shards[:-1]]).tolist()
+        self.rows = sum(len(shard) for shard in shards)
+        self.executor_kind = executor
+        self._pool = None
+        if workers > 1 and len(shards) > 1:
+            if executor == 'process':
+                if paths is None:
+                    raise ValueError("executor='process' needs file-backed shards (ScoringEngine.open).")
+                self._pool = ProcessPoolExecutor(max_workers=workers)
+            else:
+                # NumPy releases the GIL during the matrix product, so threads run in parallel
+                self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='scoring')
+
+    # --- Construction ---------------------------------------------------------
+    @classmethod
+    def from_matrix(cls, matrix, shard_rows=None, workers=1):
+        normalized = _normalize_rows(matrix)
+        shard_rows = shard_rows or len(normalized) or 1
+        shards = [normalized[i:i + shard_rows] for i in range(0, len(normalized), shard_rows)]
+        return cls(shards or [normalized], workers=workers)
+
+    @staticmethod
+    def write_shards(blocks, directory):
+        """
+        Normalizes and saves an iterable of row blocks as shard files plus a
+        manifest. Blocks are processed one at a time, so the full matrix
+        never has to fit in memory.
+        """
+        os.makedirs(directory, exist_ok=True)
+        files = []
+        for i, block in enumerate(blocks):
+            name = f'shard-{i:05d}.npy'
+            np.save(os.path.join(directory, name), _normalize_rows(block))
+            files.append(name)
+        with open(os.path.join(directory, MANIFEST), 'w') as f:
+            json.dump({'shards': files}, f)
+
+    @classmethod
+    def open(cls, directory, workers=1, executor='thread'):
+        with open(os.path.join(directory, MANIFEST)) as f:
+            files = json.load(f)['shards']
+        paths = [os.path.join(directory, name) for name in files]
+        shards = [np.load(path, mmap_mode='r') for path in paths]
+        return cls(shards, paths=paths, workers=workers, executor=executor)
+
+    # --- Scoring ------------------------------------------------------------
+    def top_k_batch(self, queries, k=10):
+        """
+        For each query vector, the indices and cosine scores of the k most
+        similar rows, best first. Returns two (n_queries, k) arrays.
+        """
+        queries = _normalize_queries(queries)
+        if self._pool is None:
+            partials = [
+                _shard_top_k(shard, offset, queries, k)
+                for shard, offset in zip(self.shards, self.offsets)
+            ]
+        elif self.executor_kind == 'process':
+            partials = list(self._pool.map(
+                _score_shard_file, self.paths, self.offsets,
+                [queries] * len(self.paths), [k] * len(self.paths),
+            ))
+        else:
+            partials = list(self._pool.map(
+                _shard_top_k, self.shards, self.offsets,
+                [queries] * len(self.shards), [k] * len(self.shards),
+            ))
+
+        if len(partials) == 1:
+            indices, scores = partials[0]
+            order = np.argsort(-scores, axis=1, kind='stable')
+            return np.take_along_axis(indices, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+        # Merge the per-shard candidates with a heap, per query
+        all_indices = np.concatenate([indices for indices, _ in partials], axis=1)
+        all_scores = np.concatenate([scores for _, scores in partials], axis=1)
+        top_indices, top_scores = [], []
+        for row_indices, row_scores in zip(all_indices, all_scores):
+            best = heapq.nlargest(k, zip(row_scores.tolist(), row_indices.tolist()))
+            top_scores.append([score for score, _ in best])
+            top_indices.append([index for _, index in best])
+        return np.array(top_indices, dtype=np.int64), np.array(top_scores, dtype=np.float32)
+
+    def top_k(self, query, k=10):
+        """top_k_batch for a single query vector; returns (indices, scores) 1-D arrays."""
+        indices, scores = self.top_k_batch(query, k)
+        return indices[0], scores[0]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
@@ -1,8 +1,34 @@
 # backend/api/serializers.py
 
 from django.contrib.auth.models import User
+from django.conf import settings
+from django.urls import get_resolver
 from rest_framework import serializers
 from .models import WatchlistItem, Profile
+from . import profiling, images
+from .upload_handlers import upload_too_large_message
+
+# ==============================================================================
+#  MIXIN: Sparse fieldsets (?fields=id,username)
+# ==============================================================================
+class SparseFieldsetMixin:
+    """
+    Lets GET requests ask for a subset of fields with `?fields=a,b,c`, which
+    trims both the work of serializing and the payload size. Unknown names
+    are ignored; without the parameter every field is returned.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method != 'GET':
+            return
+        requested = request.query_params.get('fields')
+        if not requested:
+            return
+        wanted = {name.strip() for name in requested.split(',')}
+        for name in set(self.fields) - wanted:
+            self.fields.pop(name)
+
 
 # ==============================================================================
 #  SERIALIZER #1: For Registering New Users (NO CHANGE)
@@ -25,11 +51,17 @@ class RegisterSerializer(serializers.ModelSerializer):
 #  - This is NOW strictly for reading data.
 # ==============================================================================
 class ProfileSerializer(serializers.ModelSerializer):
+    # Small pre-rendered copies for avatars/lists; {} until they are generated
+    profile_picture_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = Profile
-        fields = ['bio', 'favorite_genre', 'profile_picture']
+        fields = ['bio', 'favorite_genre', 'profile_picture', 'profile_picture_variants']
+
+    def get_profile_picture_variants(self, obj):
+        return images.variant_urls(obj, self.context.get('request'))
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     # 'read_only=True' is important. It tells DRF this field is for display only.
     profile = ProfileSerializer(read_only=True)
 
@@ -48,6 +80,12 @@ class ProfileUpdateSerializer(serializers.ModelSerializer):
         model = Profile
         fields = ['bio', 'favorite_genre', 'profile_picture']
 
+    def validate_profile_picture(self, value):
+        # Backstop: uploads are normally stopped earlier (api/upload_handlers.py)
+        if value and value.size > settings.PROFILE_PICTURE_MAX_UPLOAD_SIZE:
+            raise serializers.ValidationError(upload_too_large_message())
+        return value
+
 class UserUpdateSerializer(serializers.ModelSerializer):
     profile = ProfileUpdateSerializer()
 
@@ -73,15 +111,63 @@ class UserUpdateSerializer(serializers.ModelSerializer):
 # ==============================================================================
 #  SERIALIZER #4: For the Watchlist (NO CHANGE)
 # ==============================================================================
-class WatchlistItemSerializer(serializers.ModelSerializer):
+class WatchlistItemSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = WatchlistItem
         fields = ['id', 'user', 'movie_id', 'title', 'poster_path', 'added_at']
         read_only_fields = ['user']
 
+
+# ==============================================================================
+#  SERIALIZER #5: For Bulk Watchlist Sync (adds + removes in one request)
+# ==============================================================================
+class WatchlistSyncItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = WatchlistItem
+        fields = ['movie_id', 'title', 'poster_path']
+        # Duplicates are resolved by bulk_create(ignore_conflicts=True) in the view,
+        # so skip the per-item unique_together query.
+        validators = []
+
+
+class WatchlistSyncSerializer(serializers.Serializer):
+    MAX_ITEMS = 500
+
+    add = WatchlistSyncItemSerializer(many=True, required=False, default=list, max_length=MAX_ITEMS)
+    remove = serializers.ListField(
+        child=serializers.IntegerField(), required=False, default=list, max_length=MAX_ITEMS
+    )
+
+    def validate(self, data):
+        # Keep the first occurrence of each movie_id in 'add'
+        unique_adds = {}
+        for item in data['add']:
+            unique_adds.setdefault(item['movie_id'], item)
+        data['add'] = list(unique_adds.values())
+        data['remove'] = list(dict.fromkeys(data['remove']))
+
+        conflicting = set(unique_adds) & set(data['remove'])
+        if conflicting:
+            raise serializers.ValidationError(
+                f"movie_id(s) {sorted(conflicting)} appear in both 'add' and 'remove'."
+            )
+        return data
+
 # --- NEW: Admin serializer for updating a user's roles ---
 class AdminUserUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         # Define the fields an admin is allowed to change
-        fields = ['username', 'email', 'is_staff', 'is_active']
\ No newline at end of file
+        fields = ['username', 'email', 'is_staff', 'is_active']
+
+
+# --- NEW: Admin serializer for arming the request profiler ---
+class ProfilingArmSerializer(serializers.Serializer):
+    endpoint = serializers.CharField(help_text="URL name, e.g. 'recommendations'")
+    requests = serializers.IntegerField(min_value=1, max_value=100, default=1)
+    mode = serializers.ChoiceField(choices=profiling.MODES, default='sampling')
+
+    def validate_endpoint(self, value):
+        if value not in get_resolver().reverse_dict:
+            raise serializers.ValidationError(f"Unknown endpoint '{value}'.")
+        return value
@@ -1,7 +1,9 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.core.signals import request_finished
 from django.contrib.auth.models import User
 from django.dispatch import receiver
-from .models import Profile
+from .models import Profile, WatchlistItem
+from . import stats, images, warmup
 
 
 from django.core.exceptions import ObjectDoesNotExist
@@ -25,4 +27,44 @@ def save_user_profile(sender, instance, **kwargs):
         # If the user is being created, the create_user_profile signal below
         # will handle creating the profile. This just prevents a crash if
         # an old user without a profile is saved.
-        pass
\ No newline at end of file
+        pass
+
+
+# --- Keep the admin dashboard aggregates (api/stats.py) up to date ---
+@receiver(post_save, sender=User)
+def count_new_user(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.record_user_created(instance)
+
+@receiver(post_delete, sender=User)
+def count_deleted_user(sender, instance, **kwargs):
+    stats.record_user_deleted(instance)
+
+@receiver(post_save, sender=WatchlistItem)
+def count_new_watchlist_item(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.record_watchlist_added([instance])
+
+@receiver(post_delete, sender=WatchlistItem)
+def count_deleted_watchlist_item(sender, instance, **kwargs):
+    stats.record_watchlist_removed([instance])
+
+
+# --- Render avatar/thumbnail variants whenever a new picture is uploaded ---
+# save_user_profile re-saves the profile on every User.save() (each login),
+# so only an actual upload may queue a job: an uncommitted file is one that
+# FileField.pre_save is about to write to storage during this save.
+@receiver(pre_save, sender=Profile)
+def note_new_picture(sender, instance, raw=False, **kwargs):
+    picture = instance.profile_picture
+    instance._new_picture = not raw and bool(picture) and not picture._committed
+
+@receiver(post_save, sender=Profile)
+def queue_picture_variants(sender, instance, raw=False, **kwargs):
+    if getattr(instance, '_new_picture', False) and images.needs_variants(instance):
+        instance._new_picture = False
+        images.schedule_variants(instance)
+
+
+# --- Write the batched mood query log after the response is sent (api/warmup.py) ---
+request_finished.connect(warmup.flush_if_due, dispatch_uid='api.warmup.flush_if_due')
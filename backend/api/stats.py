@@ -0,0 +1,214 @@
+# backend/api/stats.py
+
+"""
+Incrementally maintained statistics for the admin dashboard.
+
+Every user/watchlist change is turned into a small delta (see api/signals.py)
+and applied to the aggregate tables in api/models.py with `F()` updates, so
+reading the dashboard is a handful of primary-key/index lookups no matter
+how big the User and WatchlistItem tables get.
+
+Bulk code paths can wrap their work in `with stats.batch():` so that all the
+deltas produced inside are merged and written with a few grouped queries
+instead of one UPDATE per row.
+"""
+
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailySignupCount, MovieSaveCount, StatCounter, WatchlistItem
+
+TOTAL_USERS = 'total_users'
+TOTAL_WATCHLIST_ITEMS = 'total_watchlist_items'
+
+_state = threading.local()
+
+
+class _Deltas:
+    def __init__(self):
+        self.counters = defaultdict(int)
+        self.signups = defaultdict(int)
+        self.movies = defaultdict(int)
+        # movie_id -> (title, poster_path), used when a movie is seen for the first time
+        self.movie_info = {}
+
+    def __bool__(self):
+        return bool(self.counters or self.signups or self.movies)
+
+
+# ==============================================================================
+#  RECORDING CHANGES
+# ==============================================================================
+@contextmanager
+def batch():
+    """
+    Collects every delta recorded inside the block and flushes them together
+    on exit. Nested batches are merged into the outermost one.
+    """
+    if getattr(_state, 'deltas', None) is not None:
+        yield
+        return
+
+    _state.deltas = _Deltas()
+    try:
+        yield
+        deltas = _state.deltas
+    finally:
+        _state.deltas = None
+    _flush(deltas)
+
+
+def _record(apply):
+    deltas = getattr(_state, 'deltas', None)
+    if deltas is not None:
+        apply(deltas)
+        return
+    deltas = _Deltas()
+    apply(deltas)
+    _flush(deltas)
+
+
+def record_user_created(user):
+    def apply(deltas):
+        deltas.counters[TOTAL_USERS] += 1
+        deltas.signups[timezone.localdate(user.date_joined)] += 1
+    _record(apply)
+
+
+def record_user_deleted(user):
+    def apply(deltas):
+        deltas.counters[TOTAL_USERS] -= 1
+        deltas.signups[timezone.localdate(user.date_joined)] -= 1
+    _record(apply)
+
+
+def record_watchlist_added(items):
+    def apply(deltas):
+        for item in items:
+            deltas.counters[TOTAL_WATCHLIST_ITEMS] += 1
+            deltas.movies[item.movie_id] += 1
+            deltas.movie_info.setdefault(item.movie_id, (item.title, item.poster_path))
+    _record(apply)
+
+
+def record_watchlist_removed(items):
+    def apply(deltas):
+        for item in items:
+            deltas.counters[TOTAL_WATCHLIST_ITEMS] -= 1
+            deltas.movies[item.movie_id] -= 1
+    _record(apply)
+
+
+def _apply_grouped(queryset, key_field, value_field, deltas):
+    """
+    Applies {key: delta} with one UPDATE per distinct delta value. For the
+    common case (every key moved by +1 or -1) that is a single query.
+    """
+    by_delta = defaultdict(list)
+    for key, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(key)
+    for delta, keys in by_delta.items():
+        queryset.filter(**{f'{key_field}__in': keys}).update(**{value_field: F(value_field) + delta})
+
+
+def _flush(deltas):
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        # Make sure a row exists for every key before incrementing it
+        new_counters = [name for name, delta in deltas.counters.items() if delta > 0]
+        if new_counters:
+            StatCounter.objects.bulk_create(
+                [StatCounter(name=name) for name in new_counters], ignore_conflicts=True
+            )
+        new_days = [day for day, delta in deltas.signups.items() if delta > 0]
+        if new_days:
+            DailySignupCount.objects.bulk_create(
+                [DailySignupCount(date=day) for day in new_days], ignore_conflicts=True
+            )
+        new_movies = [movie_id for movie_id, delta in deltas.movies.items() if delta > 0]
+        if new_movies:
+            MovieSaveCount.objects.bulk_create(
+                [
+                    MovieSaveCount(
+                        movie_id=movie_id,
+                        title=deltas.movie_info[movie_id][0],
+                        poster_path=deltas.movie_info[movie_id][1],
+                    )
+                    for movie_id in new_movies
+                ],
+                ignore_conflicts=True,
+            )
+
+        _apply_grouped(StatCounter.objects, 'name', 'value', deltas.counters)
+        _apply_grouped(DailySignupCount.objects, 'date', 'count', deltas.signups)
+        _apply_grouped(MovieSaveCount.objects, 'movie_id', 'count', deltas.movies)
+
+
+# ==============================================================================
+#  READING
+# ==============================================================================
+def dashboard_stats():
+    """Returns the admin dashboard payload from the aggregate tables only."""
+    counters = dict(
+        StatCounter.objects.filter(name__in=[TOTAL_USERS, TOTAL_WATCHLIST_ITEMS])
+        .values_list('name', 'value')
+    )
+
+    # Day granularity: covers the last 7 calendar days including today.
+    week_start = timezone.localdate() - timedelta(days=7)
+    new_users_last_week = DailySignupCount.objects.filter(date__gt=week_start) \
+        .aggregate(total=Sum('count'))['total'] or 0
+
+    top_movies = MovieSaveCount.objects.filter(count__gt=0) \
+        .order_by('-count') \
+        .values('movie_id', 'title', 'poster_path', 'count')[:5]
+
+    return {
+        'total_users': counters.get(TOTAL_USERS, 0),
+        'new_users_last_week': new_users_last_week,
+        'total_watchlist_items': counters.get(TOTAL_WATCHLIST_ITEMS, 0),
+        'top_watchlisted_movies': list(top_movies),
+    }
+
+
+# ==============================================================================
+#  DRIFT CORRECTION
+# ==============================================================================
+def rebuild():
+    """
+    Recomputes every aggregate from the source tables. Used by the
+    `rebuild_stats` management command to correct drift (e.g. after raw SQL
+    edits or bulk operations that bypass signals).
+    """
+    with transaction.atomic():
+        StatCounter.objects.all().delete()
+        DailySignupCount.objects.all().delete()
+        MovieSaveCount.objects.all().delete()
+
+        StatCounter.objects.bulk_create([
+            StatCounter(name=TOTAL_USERS, value=User.objects.count()),
+            StatCounter(name=TOTAL_WATCHLIST_ITEMS, value=WatchlistItem.objects.count()),
+        ])
+
+        signups = User.objects.annotate(day=TruncDate('date_joined')) \
+            .values('day').annotate(count=Count('id'))
+        DailySignupCount.objects.bulk_create(
+            [DailySignupCount(date=row['day'], count=row['count']) for row in signups]
+        )
+
+        movies = WatchlistItem.objects.values('movie_id') \
+            .annotate(count=Count('id'), title=Max('title'), poster_path=Max('poster_path'))
+        MovieSaveCount.objects.bulk_create(
+            [MovieSaveCount(**row) for row in movies], batch_size=1000
+        )
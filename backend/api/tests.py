@@ -1,3 +1,929 @@
-from django.test import TestCase
+import json
+import os
+import pstats
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from PIL import Image
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import images, profiling, stats, tmdb_service, urls, views, warmup
+from .admission import AdmissionGate, InferenceRejected
+from .renderers import FastJSONRenderer
+from .scoring import ScoringEngine
+from .management.commands import hydrate_tmdb
+from .models import MovieDetails, MoodQueryStat, MovieSaveCount, StatCounter, WatchlistItem
+from .serializers import ProfileUpdateSerializer, UserSerializer
+
+
+# Scratch space for the run, removed at exit. Settings that point at a
+# directory (PROFILING_DIR, MEDIA_ROOT) use one subdirectory of it each.
+SCRATCH = tempfile.TemporaryDirectory()
+
+
+def scratch_dir(name):
+    return os.path.join(SCRATCH.name, name)
+
+
+def empty_dir(test, path):
+    """Gives the test an empty directory at path, removed again afterwards."""
+    os.makedirs(path, exist_ok=True)
+    test.addCleanup(shutil.rmtree, path, ignore_errors=True)
+
+
+def use(test, *contexts):
+    """Enters each context (mock.patch, override_settings, ...) for the rest of the test."""
+    for context in contexts:
+        context.__enter__()
+        test.addCleanup(context.__exit__, None, None, None)
+
+
+def fake_movie_details(ids, **kwargs):
+    return {int(i): {'id': int(i), 'title': f'Movie {i}'} for i in ids}
+
+
+def mock_recommendation_model(test, **fakes):
+    """
+    Stands in for the emotion model and TMDb in api.views for the rest of the test.
+
+    The model detects mostly joy and TMDb has a stub for every movie. Pass a
+    views attribute as a keyword (e.g. extract_user_emotion_vector=mock.Mock(...))
+    to replace its fake.
+    """
+    fakes = {
+        'live_model': object(),
+        'extract_user_emotion_vector': mock.Mock(return_value=np.array([0.4, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1])),
+        'get_many_movie_details': mock.Mock(side_effect=fake_movie_details),
+        **fakes,
+    }
+    use(test, *(mock.patch.object(views, name, fake) for name, fake in fakes.items()))
+
+
+class WatchlistSyncTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('syncer', password='pass12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('watchlist-sync')
+
+    def test_adds_and_removes_in_one_request(self):
+        WatchlistItem.objects.create(user=self.user, movie_id=1, title='Old', poster_path='/a.jpg')
+        WatchlistItem.objects.create(user=self.user, movie_id=2, title='Kept', poster_path='/b.jpg')
+
+        response = self.client.post(self.url, {
+            'add': [
+                {'movie_id': 2, 'title': 'Kept', 'poster_path': '/b.jpg'},
+                {'movie_id': 3, 'title': 'New', 'poster_path': '/c.jpg'},
+            ],
+            'remove': [1, 99],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['add'], [
+            {'movie_id': 2, 'status': 'exists'},
+            {'movie_id': 3, 'status': 'added'},
+        ])
+        self.assertEqual(response.data['remove'], [
+            {'movie_id': 1, 'status': 'removed'},
+            {'movie_id': 99, 'status': 'not_found'},
+        ])
+        self.assertEqual(
+            sorted(WatchlistItem.objects.filter(user=self.user).values_list('movie_id', flat=True)),
+            [2, 3],
+        )
+
+    def test_rejects_movie_in_both_add_and_remove(self):
+        response = self.client.post(self.url, {
+            'add': [{'movie_id': 5, 'title': 'X', 'poster_path': '/x.jpg'}],
+            'remove': [5],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(WatchlistItem.objects.exists())
+
+    def test_only_touches_own_watchlist(self):
+        other = User.objects.create_user('other', password='pass12345')
+        WatchlistItem.objects.create(user=other, movie_id=7, title='Theirs', poster_path='/t.jpg')
+
+        response = self.client.post(self.url, {'remove': [7]}, format='json')
+
+        self.assertEqual(response.data['remove'], [{'movie_id': 7, 'status': 'not_found'}])
+        self.assertTrue(WatchlistItem.objects.filter(user=other, movie_id=7).exists())
+
+
+class DashboardStatsTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='pass12345', is_staff=True)
+        self.alice = User.objects.create_user('alice', password='pass12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def add(self, user, movie_id, title):
+        return WatchlistItem.objects.create(user=user, movie_id=movie_id, title=title, poster_path=f'/{movie_id}.jpg')
+
+    def test_counters_follow_signals(self):
+        self.add(self.admin, 10, 'Popular')
+        self.add(self.alice, 10, 'Popular')
+        item = self.add(self.alice, 20, 'Niche')
+        item.delete()
+
+        data = self.client.get(reverse('admin-stats')).data
+
+        self.assertEqual(data['total_users'], 2)
+        self.assertEqual(data['new_users_last_week'], 2)
+        self.assertEqual(data['total_watchlist_items'], 2)
+        self.assertEqual(data['top_watchlisted_movies'], [
+            {'movie_id': 10, 'title': 'Popular', 'poster_path': '/10.jpg', 'count': 2},
+        ])
+
+    def test_dashboard_does_not_scan_source_tables(self):
+        for movie_id in range(5):
+            self.add(self.alice, movie_id, f'Movie {movie_id}')
+
+        # counters + last-week signups + top movies, independent of table sizes
+        with self.assertNumQueries(3):
+            self.client.get(reverse('admin-stats'))
+
+    def test_bulk_sync_and_user_deletion_are_counted(self):
+        self.client.force_authenticate(self.alice)
+        self.client.post(reverse('watchlist-sync'), {
+            'add': [{'movie_id': i, 'title': f'M{i}', 'poster_path': '/p.jpg'} for i in range(3)],
+        }, format='json')
+        self.assertEqual(StatCounter.objects.get(name=stats.TOTAL_WATCHLIST_ITEMS).value, 3)
+
+        self.alice.delete()
+
+        summary = stats.dashboard_stats()
+        self.assertEqual(summary['total_users'], 1)
+        self.assertEqual(summary['total_watchlist_items'], 0)
+        self.assertEqual(summary['top_watchlisted_movies'], [])
+
+    def test_user_deletion_cost_does_not_grow_with_watchlist(self):
+        def delete_user_with_items(username, count):
+            user = User.objects.create(username=username)
+            for movie_id in range(count):
+                self.add(user, movie_id, f'Movie {movie_id}')
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.delete(reverse('admin-user-detail', args=[user.pk]))
+            self.assertEqual(response.status_code, 204)
+            return len(ctx)
+
+        self.assertEqual(delete_user_with_items('casual', 2), delete_user_with_items('collector', 50))
+        self.assertEqual(stats.dashboard_stats()['total_watchlist_items'], 0)
+
+    def test_rebuild_corrects_drift(self):
+        self.add(self.alice, 10, 'Popular')
+        StatCounter.objects.filter(name=stats.TOTAL_USERS).update(value=999)
+        MovieSaveCount.objects.all().delete()
+
+        call_command('rebuild_stats', stdout=StringIO())
+
+        summary = stats.dashboard_stats()
+        self.assertEqual(summary['total_users'], 2)
+        self.assertEqual(summary['top_watchlisted_movies'][0]['count'], 1)
+
+
+class AdminUserListTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', email='boss@example.com', password='pass12345', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.url = reverse('admin-user-list')
+
+    def make_users(self, count, prefix='user'):
+        for i in range(count):
+            User.objects.create(username=f'{prefix}{i}', email=f'{prefix}{i}@example.com')
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_query_count_is_constant(self):
+        self.make_users(3)
+        few = self.count_queries()
+        self.make_users(30, prefix='more')
+        many = self.count_queries()
+
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, 2)
+
+    def test_keyset_pagination_walks_every_user_once(self):
+        self.make_users(7)
+        seen = []
+        response = self.client.get(self.url, {'page_size': 3})
+        while True:
+            seen.extend(user['username'] for user in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+
+        self.assertEqual(len(seen), 8)
+        self.assertEqual(len(set(seen)), 8)
+
+    def test_search_and_staff_filter(self):
+        self.make_users(2, prefix='carol')
+        self.make_users(2, prefix='dave')
+
+        response = self.client.get(self.url, {'search': 'CAROL'})
+        self.assertEqual(sorted(u['username'] for u in response.data['results']), ['carol0', 'carol1'])
+
+        response = self.client.get(self.url, {'search': 'boss@'})
+        self.assertEqual([u['username'] for u in response.data['results']], ['admin'])
+
+        response = self.client.get(self.url, {'is_staff': 'true'})
+        self.assertEqual([u['username'] for u in response.data['results']], ['admin'])
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create(username='admin', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_metrics_endpoint_reports_request_latency(self):
+        self.client.get(reverse('admin-stats'))
+        self.client.force_login(self.admin)
+
+        response = self.client.get('/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('cinesense_http_request_duration_seconds_count{endpoint="admin-stats",method="GET"}', body)
+        self.assertIn('cinesense_http_requests_total{endpoint="admin-stats",method="GET",status="200"}', body)
+
+    @override_settings(METRICS_TOKEN='scrape-me')
+    def test_metrics_endpoint_requires_token_or_staff(self):
+        anonymous = APIClient()
+        self.assertEqual(anonymous.get('/metrics').status_code, 403)
+        self.assertEqual(anonymous.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-me').status_code, 200)
+
+    @override_settings(METRICS_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('admin-stats'))
+
+        self.assertIn('total;dur=', response['Server-Timing'])
+        self.assertIn('db;desc="3 queries"', response['Server-Timing'])
+
+
+@override_settings(PROFILING_DIR=scratch_dir('profiles'))
+class ProfilingTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create(username='admin', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        empty_dir(self, settings.PROFILING_DIR)
+        self.addCleanup(profiling.disarm)
+
+    def test_profiles_next_n_requests_then_disarms(self):
+        response = self.client.post(reverse('admin-profiling'),
+                                    {'endpoint': 'admin-stats', 'requests': 2, 'mode': 'cprofile'}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        for _ in range(3):
+            self.assertEqual(self.client.get(reverse('admin-stats')).status_code, 200)
+
+        listing = self.client.get(reverse('admin-profiling')).data
+        self.assertEqual(listing['armed'], {})
+        self.assertEqual(len(listing['profiles']), 2)
+
+        name = listing['profiles'][0]['name']
+        response = self.client.get(reverse('admin-profile-download', args=[name]))
+        self.assertEqual(response.status_code, 200)
+        path = os.path.join(settings.PROFILING_DIR, name)
+        self.assertGreater(pstats.Stats(path).total_calls, 0)
+
+    def test_sampling_mode_writes_collapsed_stacks(self):
+        with override_settings(PROFILING_SAMPLE_INTERVAL=0.0001):
+            profiling.arm('admin-stats', 1, 'sampling')
+            self.client.get(reverse('admin-stats'))
+
+        [profile] = profiling.list_profiles()
+        self.assertTrue(profile['name'].endswith('.collapsed'))
+
+    def test_concurrent_cprofile_requests_are_not_counted(self):
+        profiling.arm('admin-stats', 2, 'cprofile')
+
+        self.assertEqual(profiling.claim('admin-stats'), 'cprofile')
+        self.assertIsNone(profiling.claim('admin-stats'))  # the first one is still running
+        self.assertEqual(profiling.armed()['admin-stats']['remaining'], 1)
+
+        profiling.run('admin-stats', 'cprofile', lambda: None)
+        self.assertEqual(profiling.claim('admin-stats'), 'cprofile')
+        profiling.run('admin-stats', 'cprofile', lambda: None)
+        self.assertEqual(len(profiling.list_profiles()), 2)
+
+    def test_rejects_unknown_endpoint_and_non_admins(self):
+        response = self.client.post(reverse('admin-profiling'), {'endpoint': 'nope'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        self.client.force_authenticate(User.objects.create(username='plain'))
+        response = self.client.post(reverse('admin-profiling'), {'endpoint': 'admin-stats'}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.client.get(reverse('admin-profile-download', args=['x.pstats'])).status_code, 403)
+
+
+class RecommendationCachingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='viewer'))
+        self.url = reverse('recommendations')
+        mock_recommendation_model(self)
+
+    def test_repeat_queries_hit_the_cache(self):
+        first = self.client.get(self.url, {'mood': 'Happy  and Excited'})
+        second = self.client.get(self.url, {'mood': 'happy and excited '})
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(views.extract_user_emotion_vector.call_count, 1)
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertTrue(first['ETag'].startswith('W/"'))
+        self.assertEqual(first.data['recommendations'], second.data['recommendations'])
+        self.assertEqual(second.data['user_mood_text'], 'happy and excited ')
+        self.assertIn('private', first['Cache-Control'])
+        self.assertIn('Last-Modified', first)
+
+    def test_if_none_match_returns_304_without_inference(self):
+        etag = self.client.get(self.url, {'mood': 'sad'})['ETag']
+        cache.clear()
+
+        response = self.client.get(self.url, {'mood': 'sad'}, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(views.extract_user_emotion_vector.call_count, 1)
+
+    def test_different_moods_get_different_etags(self):
+        sad = self.client.get(self.url, {'mood': 'sad'})
+        angry = self.client.get(self.url, {'mood': 'angry'})
+
+        self.assertNotEqual(sad['ETag'], angry['ETag'])
+        self.assertEqual(views.extract_user_emotion_vector.call_count, 2)
+
+    def test_incomplete_payloads_are_cached_briefly_without_etag(self):
+        # TMDb has no details for one of the ten movies
+        views.get_many_movie_details.side_effect = \
+            lambda ids, **kwargs: {int(i): {'id': int(i)} for i in ids[1:]}
+
+        first = self.client.get(self.url, {'mood': 'sad'})
+        second = self.client.get(self.url, {'mood': 'sad'})
+
+        self.assertEqual(len(first.data['recommendations']), 9)
+        self.assertNotIn('ETag', first)
+        self.assertIn('no-store', first['Cache-Control'])
+        self.assertEqual(views.extract_user_emotion_vector.call_count, 1)
+        self.assertNotIn('ETag', second)
+        key = views.recommendation_cache_key('sad')
+        self.assertIsNone(cache.get(key))
+        self.assertIsNotNone(cache.get(f'{key}:partial'))
+
+
+def make_image_file(name='photo.png', size=(600, 400), color='orange'):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(MEDIA_ROOT=scratch_dir('media'), PROFILE_PICTURE_VARIANTS_ASYNC=False)
+class ProfilePictureVariantTests(TestCase):
+    def setUp(self):
+        empty_dir(self, settings.MEDIA_ROOT)
+        self.user = User.objects.create(username='picasso')
+
+    def test_variants_are_generated_with_content_hashed_names(self):
+        profile = self.user.profile
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.profile_picture = make_image_file()
+            profile.save()
+
+        profile.refresh_from_db()
+        thumbnail = profile.picture_variants['thumbnail']
+        self.assertEqual(profile.picture_variants['source'], profile.profile_picture.name)
+        self.assertRegex(thumbnail['webp'], r'^profile_pics/picasso/variants/thumbnail-[0-9a-f]{12}\.webp$')
+        with Image.open(os.path.join(settings.MEDIA_ROOT, thumbnail['jpeg'])) as image:
+            self.assertEqual(image.size, (80, 80))
+
+        urls = UserSerializer(self.user).data['profile']['profile_picture_variants']
+        self.assertEqual(urls['avatar']['webp'], '/media/' + profile.picture_variants['avatar']['webp'])
+
+    def test_replacing_the_picture_removes_old_variants(self):
+        profile = self.user.profile
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.profile_picture = make_image_file()
+            profile.save()
+        profile.refresh_from_db()
+        old_thumbnail = profile.picture_variants['thumbnail']['webp']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.profile_picture = make_image_file('new.png', color='teal')
+            profile.save()
+
+        profile.refresh_from_db()
+        self.assertNotEqual(profile.picture_variants['thumbnail']['webp'], old_thumbnail)
+        self.assertFalse(os.path.exists(os.path.join(settings.MEDIA_ROOT, old_thumbnail)))
+
+    def test_only_uploads_queue_variant_jobs(self):
+        with mock.patch.object(images, 'schedule_variants') as schedule:
+            profile = self.user.profile
+            profile.profile_picture = make_image_file()
+            profile.save()
+            # Logging in saves the user, which re-saves the profile
+            self.user.save()
+            User.objects.get(pk=self.user.pk).profile.save()
+
+        self.assertEqual(schedule.call_count, 1)
+
+    @override_settings(PROFILE_PICTURE_VARIANTS_ASYNC=True)
+    def test_picture_with_a_job_in_flight_is_not_queued_again(self):
+        profile = self.user.profile
+        profile.profile_picture = 'profile_pics/picasso/photo.png'
+        executor = mock.Mock()
+        with mock.patch.object(images, '_get_executor', return_value=executor), \
+                self.captureOnCommitCallbacks(execute=True):
+            images.schedule_variants(profile)
+            images.schedule_variants(profile)
+        self.addCleanup(images._in_flight.clear)
+
+        self.assertEqual(executor.submit.call_count, 1)
+
+    def upload(self, size):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        picture = SimpleUploadedFile('big.png', os.urandom(size), content_type='image/png')
+        return client.patch(reverse('user-profile'), {'profile.profile_picture': picture}, format='multipart')
+
+    @override_settings(PROFILE_PICTURE_MAX_UPLOAD_SIZE=100 * 1024)
+    def test_oversized_upload_is_stopped_while_streaming(self):
+        # Within the form overhead allowance, so only the upload handler can catch it
+        stored = []
+        with mock.patch('django.core.files.uploadhandler.MemoryFileUploadHandler.receive_data_chunk',
+                        autospec=True, side_effect=lambda handler, data, start: stored.append(len(data))):
+            response = self.upload(130 * 1024)
+
+        self.assertEqual(response.status_code, 413)
+        self.assertIn('profile_picture', response.data)
+        self.user.profile.refresh_from_db()
+        self.assertFalse(self.user.profile.profile_picture)
+        # Data arrives in 64 KiB chunks: the one that crosses the limit never reaches storage
+        self.assertEqual(len(stored), 1)
+        self.assertLessEqual(sum(stored), 100 * 1024)
+
+    @override_settings(PROFILE_PICTURE_MAX_UPLOAD_SIZE=10 * 1024)
+    def test_oversized_request_is_refused_before_reading(self):
+        with mock.patch('api.upload_handlers.ProfilePictureUploadHandler.receive_data_chunk') as handler:
+            response = self.upload(200 * 1024)
+
+        self.assertEqual(response.status_code, 413)
+        handler.assert_not_called()
+
+    @override_settings(PROFILE_PICTURE_MAX_UPLOAD_SIZE=1024)
+    def test_oversized_upload_is_rejected(self):
+        serializer = ProfileUpdateSerializer(data={'profile_picture': make_image_file(size=(2000, 2000))})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('profile_picture', serializer.errors)
+
+
+class FakeTMDbHandler(BaseHTTPRequestHandler):
+    """Answers /movie/<id> like TMDb; ids listed in `missing` return 404."""
+    requested = []
+    missing = set()
+
+    def do_GET(self):
+        movie_id = int(self.path.split('?')[0].rstrip('/').split('/')[-1])
+        self.requested.append(movie_id)
+        if movie_id in self.missing:
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = json.dumps({
+            'id': movie_id, 'title': f'Movie {movie_id}', 'overview': 'Plot.',
+            'poster_path': f'/{movie_id}.jpg', 'release_date': '2020-01-01', 'vote_average': 7.5,
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TMDbHydrationTests(TestCase):
+    def setUp(self):
+        FakeTMDbHandler.requested = []
+        FakeTMDbHandler.missing = set()
+        server = ThreadingHTTPServer(('127.0.0.1', 0), FakeTMDbHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        # The server's port is only known now, so this can't be a class decorator
+        use(self,
+            override_settings(TMDB_API_BASE_URL=f'http://127.0.0.1:{server.server_port}'),
+            mock.patch.dict(os.environ, {'TMDB_API_KEY': 'test-key'}),
+            mock.patch.object(hydrate_tmdb, 'load_catalog_ids', return_value=list(range(1, 26))))
+
+    def hydrate(self, *args):
+        call_command('hydrate_tmdb', '--concurrency', '4', '--rate', '0', '--batch-size', '10', *args,
+                     stdout=StringIO())
+
+    def test_hydrates_whole_catalog_and_resumes(self):
+        FakeTMDbHandler.missing = {7}
+        self.hydrate()
+
+        self.assertEqual(MovieDetails.objects.count(), 24)
+        self.assertEqual(MovieDetails.objects.get(pk=3).title, 'Movie 3')
+
+        # A second run only retries what is still missing
+        FakeTMDbHandler.requested = []
+        FakeTMDbHandler.missing = set()
+        self.hydrate()
+        self.assertEqual(FakeTMDbHandler.requested, [7])
+        self.assertEqual(MovieDetails.objects.count(), 25)
+
+    def test_limit_and_stale_rows(self):
+        self.hydrate('--limit', '5')
+        self.assertEqual(MovieDetails.objects.count(), 5)
+
+        MovieDetails.objects.filter(pk=1).update(fetched_at=tmdb_service.fresh_cutoff() - timedelta(days=1))
+        FakeTMDbHandler.requested = []
+        self.hydrate('--limit', '1')
+        self.assertEqual(FakeTMDbHandler.requested, [1])
+
+    def test_get_movie_details_reads_through_the_store(self):
+        self.assertEqual(tmdb_service.get_movie_details(42)['title'], 'Movie 42')
+        self.assertEqual(tmdb_service.get_movie_details(42)['poster_path'], '/42.jpg')
+        self.assertEqual(FakeTMDbHandler.requested, [42])
+
+    def test_deadline_cuts_tmdb_calls_short(self):
+        self.assertEqual(tmdb_service.get_many_movie_details([1, 2], deadline=time.monotonic()), {})
+        self.assertEqual(FakeTMDbHandler.requested, [])
+
+        with mock.patch.object(tmdb_service, 'fetch_movie_details', return_value=None) as fetch:
+            tmdb_service.get_many_movie_details([3], deadline=time.monotonic() + 2)
+        self.assertLessEqual(fetch.call_args.kwargs['timeout'], 2)
+
+    def test_stored_details_never_call_tmdb(self):
+        self.hydrate('--limit', '2')
+        MovieDetails.objects.filter(pk=1).update(fetched_at=tmdb_service.fresh_cutoff() - timedelta(days=1))
+        FakeTMDbHandler.requested = []
+
+        details = tmdb_service.stored_movie_details([1, 2, 99])
+
+        self.assertEqual(sorted(details), [1, 2])  # the stale row is still good enough
+        self.assertEqual(FakeTMDbHandler.requested, [])
+
+
+class AdmissionControlTests(TestCase):
+    def test_gate_sheds_when_queue_is_full(self):
+        gate = AdmissionGate(max_concurrency=1, max_queue=0, timeout=1)
+        with gate.admit():
+            with self.assertRaises(InferenceRejected) as ctx:
+                with gate.admit():
+                    pass
+        self.assertEqual(ctx.exception.reason, 'queue_full')
+
+    def test_gate_sheds_after_deadline(self):
+        gate = AdmissionGate(max_concurrency=1, max_queue=1, timeout=0.01)
+        with gate.admit():
+            with self.assertRaises(InferenceRejected) as ctx:
+                with gate.admit():
+                    pass
+        self.assertEqual(ctx.exception.reason, 'deadline')
+        self.assertEqual(gate.waiting, 0)
+        # The slot is released again afterwards
+        with gate.admit():
+            pass
+
+    def test_overloaded_recommendations_degrade_or_503(self):
+        cache.clear()
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username='viewer'))
+        mock_recommendation_model(
+            self,
+            extract_user_emotion_vector=mock.Mock(side_effect=InferenceRejected('deadline')),
+            get_many_movie_details=mock.Mock(side_effect=AssertionError('called TMDb')),
+            stored_movie_details=mock.Mock(side_effect=lambda ids, **kwargs: {int(i): {'id': int(i)} for i in ids}),
+        )
+        lexicon = client.get(reverse('recommendations'), {'mood': 'I feel happy'})
+        busy = client.get(reverse('recommendations'), {'mood': 'qwerty'})
+        MovieSaveCount.objects.create(movie_id=7, title='Seven', poster_path='/7.jpg', count=3)
+        popular = client.get(reverse('recommendations'), {'mood': 'qwerty'})
+
+        self.assertEqual(lexicon.status_code, 200)
+        self.assertEqual(lexicon.data['degraded'], 'lexicon')
+        self.assertEqual(len(lexicon.data['recommendations']), 10)
+        self.assertIn('no-store', lexicon['Cache-Control'])
+
+        # No lexicon match and nothing popular yet
+        self.assertEqual(busy.status_code, 503)
+        self.assertEqual(busy['Retry-After'], '5')
+
+        self.assertEqual(popular.data['degraded'], 'popular')
+        self.assertEqual(popular.data['recommendations'], [{'id': 7}])
+        self.assertNotIn('detected_emotion_profile', popular.data)
+
+
+class ScoringEngineTests(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.matrix = rng.random((1000, 7))
+        self.matrix[5] = 0  # an all-zero row must not break normalization
+        self.queries = rng.random((3, 7))
+
+    def brute_force(self, query, k):
+        normalized = self.matrix / np.maximum(np.linalg.norm(self.matrix, axis=1, keepdims=True), 1e-12)
+        sims = normalized @ (query / np.linalg.norm(query))
+        return np.sort(sims)[::-1][:k]
+
+    def assertMatchesBruteForce(self, engine, k=10):
+        indices, scores = engine.top_k_batch(self.queries, k)
+        self.assertEqual(indices.shape, (3, k))
+        for query, row_indices, row_scores in zip(self.queries, indices, scores):
+            np.testing.assert_allclose(row_scores, self.brute_force(query, k), atol=1e-5)
+            self.assertEqual(len(set(row_indices.tolist())), k)
+
+    def test_single_and_in_memory_shards(self):
+        self.assertMatchesBruteForce(ScoringEngine.from_matrix(self.matrix))
+        engine = ScoringEngine.from_matrix(self.matrix, shard_rows=128, workers=3)
+        self.addCleanup(engine.close)
+        self.assertMatchesBruteForce(engine)
+
+    def test_mmap_shards_on_disk(self):
+        with tempfile.TemporaryDirectory() as directory:
+            ScoringEngine.write_shards((self.matrix[i:i + 300] for i in range(0, 1000, 300)), directory)
+            engine = ScoringEngine.open(directory, workers=2)
+            self.assertEqual(engine.rows, 1000)
+            self.assertMatchesBruteForce(engine)
+            engine.close()
+
+    def test_k_larger_than_a_shard(self):
+        engine = ScoringEngine.from_matrix(self.matrix, shard_rows=4)
+        self.assertMatchesBruteForce(engine, k=10)
+
+    def test_zero_query_scores_zero(self):
+        _, scores = ScoringEngine.from_matrix(self.matrix).top_k(np.zeros(7), 3)
+        np.testing.assert_array_equal(scores, np.zeros(3))
+
+    def test_view_loads_shards_built_from_the_catalog(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        call_command('build_scoring_shards', '--out', directory.name, '--shard-rows', '300', stdout=StringIO())
+
+        with override_settings(SCORING_SHARD_DIR=directory.name):
+            engine, shard_files = views.load_scoring_engine(views.movies_df, views.movie_emotion_matrix)
+            with self.assertRaises(ValueError):
+                views.load_scoring_engine(views.movies_df.iloc[:10], views.movie_emotion_matrix)
+        self.addCleanup(engine.close)
+
+        self.assertEqual(len(engine.shards), -(-len(views.movies_df) // 300))
+        self.assertIn(os.path.join(directory.name, 'manifest.json'), shard_files)
+        in_memory = ScoringEngine.from_matrix(views.movie_emotion_matrix)
+        query = np.array([0.4, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1])
+        np.testing.assert_array_equal(engine.top_k(query, 10)[0], in_memory.top_k(query, 10)[0])
+
+
+class PopularMoodWarmupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        warmup.flush()
+        # Importing api.views can take a while; don't let that count as idle time
+        warmup._last_flush = time.monotonic()
+        warmup._flush_due = False
+        MoodQueryStat.objects.all().delete()
+        mock_recommendation_model(self, build_recommendations=mock.Mock(
+            side_effect=lambda mood, **kwargs: ({'detected_emotion_profile': {}, 'recommendations': [mood]},
+                                                mood != 'bored'),
+        ))
+
+    def log_queries(self, counts):
+        with override_settings(MOOD_LOG_FLUSH_EVERY=10_000):
+            for mood, count in counts.items():
+                for _ in range(count):
+                    warmup.record_mood_query(mood)
+        warmup.flush()
+
+    def test_query_log_is_aggregated_and_flushed_in_batches(self):
+        with override_settings(MOOD_LOG_FLUSH_EVERY=3):
+            warmup.record_mood_query('happy')
+            warmup.record_mood_query('happy')
+            warmup.flush_if_due()
+            self.assertFalse(MoodQueryStat.objects.exists())
+            warmup.record_mood_query('sad')
+            self.assertFalse(MoodQueryStat.objects.exists())  # never written inline
+            warmup.flush_if_due()
+
+        self.assertEqual(dict(MoodQueryStat.objects.values_list('mood', 'count')), {'happy': 2, 'sad': 1})
+
+    @override_settings(MOOD_LOG_FLUSH_EVERY=1)
+    def test_query_log_is_written_when_the_request_finishes(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username='viewer'))
+
+        response = client.get(reverse('recommendations'), {'mood': 'Happy'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(dict(MoodQueryStat.objects.values_list('mood', 'count')), {'happy': 1})
+
+    def test_warms_top_n_moods_into_the_cache(self):
+        self.log_queries({'happy': 5, 'sad': 3, 'bored': 1})
+
+        result = warmup.warm_popular_moods(top_n=2, time_budget=60, log=lambda message: None)
+
+        self.assertEqual(result, {'warmed': 2, 'cached': 0, 'incomplete': 0, 'skipped': 0})
+        # TMDb calls are bounded by the same time budget
+        self.assertLessEqual(views.build_recommendations.call_args.kwargs['deadline'], time.monotonic() + 60)
+        self.assertEqual(cache.get(views.recommendation_cache_key('happy'))['recommendations'], ['happy'])
+        self.assertIsNone(cache.get(views.recommendation_cache_key('bored')))
+
+        # The warmed payload is what the view serves
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username='viewer'))
+        response = client.get(reverse('recommendations'), {'mood': 'Happy'})
+        self.assertEqual(response.data['recommendations'], ['happy'])
+        self.assertEqual(views.build_recommendations.call_count, 2)
+
+    def test_incomplete_payloads_are_not_warmed(self):
+        self.log_queries({'happy': 2, 'bored': 1})
+
+        result = warmup.warm_popular_moods(top_n=10, time_budget=60, log=lambda message: None)
+
+        self.assertEqual(result, {'warmed': 1, 'cached': 0, 'incomplete': 1, 'skipped': 0})
+        self.assertIsNone(cache.get(views.recommendation_cache_key('bored')))
+
+    def test_time_budget_stops_warming(self):
+        self.log_queries({'happy': 2, 'sad': 1})
+
+        result = warmup.warm_popular_moods(top_n=10, time_budget=0, log=lambda message: None)
+
+        self.assertEqual(result, {'warmed': 0, 'cached': 0, 'incomplete': 0, 'skipped': 2})
+
+
+class RenderingTests(TestCase):
+    def test_fast_renderer_matches_stock_renderer(self):
+        user = User.objects.create(username='renée', email='r@example.com')
+        data = UserSerializer(user).data
+        self.assertEqual(json.loads(FastJSONRenderer().render(data)), json.loads(JSONRenderer().render(data)))
+
+    def test_fast_renderer_handles_numpy(self):
+        data = {'scores': np.array([0.5, 0.25], dtype=np.float32), 'best': np.float64(0.5)}
+        self.assertEqual(json.loads(FastJSONRenderer().render(data)), {'scores': [0.5, 0.25], 'best': 0.5})
+
+    def test_sparse_fieldsets_on_list_endpoints(self):
+        admin = User.objects.create(username='admin', is_staff=True)
+        WatchlistItem.objects.create(user=admin, movie_id=1, title='One', poster_path='/1.jpg')
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        watchlist = client.get(reverse('watchlist-list-create'), {'fields': 'movie_id,title'})
+        self.assertEqual(watchlist.json(), [{'movie_id': 1, 'title': 'One'}])
+
+        users = client.get(reverse('admin-user-list'), {'fields': 'id,username,bogus'})
+        self.assertEqual(users.json()['results'], [{'id': admin.id, 'username': 'admin'}])
+
+        full = client.get(reverse('watchlist-list-create'))
+        self.assertIn('added_at', full.json()[0])
+
+
+# (url name, method) -> most queries one request may run, session and auth
+# lookups included. A new endpoint needs an entry here.
+QUERY_BUDGETS = {
+    ('register', 'post'): 11,
+    ('login', 'post'): 8,
+    ('current-user', 'get'): 2,
+    ('user-profile', 'get'): 2,
+    ('user-profile', 'patch'): 5,
+    ('watchlist-list-create', 'get'): 2,
+    ('watchlist-list-create', 'post'): 8,
+    ('watchlist-sync', 'post'): 12,
+    ('watchlist-destroy', 'delete'): 7,
+    ('recommendations', 'get'): 1,
+    ('admin-stats', 'get'): 4,
+    ('admin-user-list', 'get'): 2,
+    ('admin-user-detail', 'get'): 3,
+    ('admin-user-detail', 'patch'): 5,
+    ('admin-user-detail', 'delete'): 17,
+    ('admin-profiling', 'get'): 1,
+    ('admin-profiling', 'post'): 1,
+    ('admin-profiling', 'delete'): 1,
+    ('admin-profile-download', 'get'): 1,
+    ('metrics', 'get'): 1,
+    ('logout', 'post'): 3,
+}
+
+
+class QueryBudgetMixin:
+    @contextmanager
+    def assertQueryBudget(self, budget, label='Block'):
+        """Fails if the queries run inside the block exceed budget, listing them."""
+        with CaptureQueriesContext(connection) as ctx:
+            yield ctx
+        if len(ctx) > budget:
+            queries = '\n'.join(f'  {query["sql"]}' for query in ctx.captured_queries)
+            self.fail(f'{label} ran {len(ctx)} queries, budget is {budget}:\n{queries}')
+
+
+# The mood query log never flushes here, so the budgets measure the views'
+# own queries rather than how long ago the last flush was (api/warmup.py).
+# Sessions use the production profile with a shared cache (REDIS_URL), where
+# reading a session costs no query; the test process is the only "worker".
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+                   MOOD_LOG_FLUSH_EVERY=10 ** 9, MOOD_LOG_FLUSH_INTERVAL=10 ** 9,
+                   SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+                   PROFILING_DIR=scratch_dir('profiles'))
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        warmup._last_flush = time.monotonic()
+        warmup._flush_due = False
+        self.admin = User.objects.create_user('admin', password='pass12345', is_staff=True)
+        self.member = User.objects.create(username='member')
+        self.leaver = User.objects.create(username='leaver')
+        for user, movie_ids in ((self.admin, (1, 2)), (self.leaver, range(10, 30))):
+            for movie_id in movie_ids:
+                WatchlistItem.objects.create(user=user, movie_id=movie_id, title=f'Movie {movie_id}',
+                                             poster_path=f'/{movie_id}.jpg')
+        self.client = APIClient()
+        self.client.force_login(self.admin)  # a real session, read through SESSION_ENGINE
+
+        empty_dir(self, settings.PROFILING_DIR)
+        self.addCleanup(profiling.disarm)
+        with open(os.path.join(settings.PROFILING_DIR, 'sample.pstats'), 'wb'):
+            pass
+        mock_recommendation_model(self)
+
+    def cases(self):
+        """One representative request per QUERY_BUDGETS entry: (url args, data)."""
+        return {
+            ('register', 'post'): ({}, {'username': 'newbie', 'password': 'pass12345'}),
+            ('login', 'post'): ({}, {'username': 'admin', 'password': 'pass12345'}),
+            ('current-user', 'get'): ({}, None),
+            ('user-profile', 'get'): ({}, None),
+            ('user-profile', 'patch'): ({}, {'email': 'admin@example.com', 'profile': {'bio': 'Hi'}}),
+            ('watchlist-list-create', 'get'): ({}, None),
+            ('watchlist-list-create', 'post'): ({}, {'movie_id': 3, 'title': 'Three', 'poster_path': '/3.jpg'}),
+            ('watchlist-sync', 'post'): ({}, {
+                'add': [{'movie_id': 4, 'title': 'Four', 'poster_path': '/4.jpg'}], 'remove': [1],
+            }),
+            ('watchlist-destroy', 'delete'): ({'movie_id': 2}, None),
+            ('recommendations', 'get'): ({}, {'mood': 'happy'}),
+            ('admin-stats', 'get'): ({}, None),
+            ('admin-user-list', 'get'): ({}, None),
+            ('admin-user-detail', 'get'): ({'pk': self.member.pk}, None),
+            ('admin-user-detail', 'patch'): ({'pk': self.member.pk}, {'is_active': False}),
+            ('admin-user-detail', 'delete'): ({'pk': self.leaver.pk}, None),
+            ('admin-profiling', 'get'): ({}, None),
+            ('admin-profiling', 'post'): ({}, {'endpoint': 'admin-stats'}),
+            ('admin-profiling', 'delete'): ({}, None),
+            ('admin-profile-download', 'get'): ({'name': 'sample.pstats'}, None),
+            ('metrics', 'get'): ({}, None),
+            ('logout', 'post'): ({}, None),
+        }
+
+    def test_every_api_view_has_a_budget(self):
+        names = {pattern.name for pattern in urls.urlpatterns}
+        self.assertEqual(names - {name for name, _ in QUERY_BUDGETS}, set())
+        self.assertEqual(set(self.cases()), set(QUERY_BUDGETS))
+
+    def test_api_views_stay_within_query_budget(self):
+        for (name, method), (kwargs, data) in self.cases().items():
+            url = reverse(name, kwargs=kwargs)
+            with self.subTest(endpoint=name, method=method):
+                with self.assertQueryBudget(QUERY_BUDGETS[name, method], f'{method.upper()} {url}'):
+                    if method == 'get':
+                        response = self.client.get(url, data)
+                    else:
+                        response = getattr(self.client, method)(url, data, format='json')
+                self.assertLess(response.status_code, 400)
+                response.close()
+
+    def test_session_is_read_from_the_cache(self):
+        self.client.get(reverse('current-user'))  # the session is cached after the first read
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('current-user'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in ctx.captured_queries if 'django_session' in q['sql']])
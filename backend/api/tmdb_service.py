@@ -1,24 +1,41 @@
 # backend/api/tmdb_service.py
 
 import os
+import time
+from datetime import timedelta
+
 import requests
+from django.conf import settings
+from django.utils import timezone
 
-def get_movie_details(movie_id):
+from . import metrics
+from .models import MovieDetails
+
+DETAIL_FIELDS = ['title', 'overview', 'poster_path', 'release_date', 'vote_average']
+
+# Reuse TCP/TLS connections to TMDb across calls
+_session = requests.Session()
+
+
+def fetch_movie_details(movie_id, session=None, timeout=None):
     """
     Fetches details for a single movie from the TMDb API.
+    Returns None if the key is missing or the request fails.
     """
     api_key = os.getenv('TMDB_API_KEY')
     if not api_key:
         print("ERROR: TMDB_API_KEY not found in environment variables.")
         return None
 
-    url = f"https://api.themoviedb.org/3/movie/{movie_id}?api_key={api_key}&language=en-US"
+    url = f"{settings.TMDB_API_BASE_URL}/movie/{movie_id}"
 
     try:
-        response = requests.get(url)
+        response = (session or _session).get(
+            url, params={'api_key': api_key, 'language': 'en-US'}, timeout=timeout or settings.TMDB_TIMEOUT
+        )
         response.raise_for_status() # Raise an exception for bad status codes
         data = response.json()
-        
+
         # We only need a few key pieces of information
         details = {
             'id': data.get('id'),
@@ -31,4 +48,71 @@ def get_movie_details(movie_id):
         return details
     except requests.RequestException as e:
         print(f"Error fetching details for movie_id {movie_id}: {e}")
-        return None
\ No newline at end of file
+        return None
+
+
+def store_movie_details(details_list):
+    """Upserts fetched details into the local store with a single bulk query."""
+    now = timezone.now()
+    rows = [
+        MovieDetails(movie_id=details['id'], fetched_at=now, **{f: details.get(f) for f in DETAIL_FIELDS})
+        for details in details_list
+    ]
+    MovieDetails.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['movie_id'],
+        update_fields=DETAIL_FIELDS + ['fetched_at'],
+    )
+
+
+def fresh_cutoff():
+    return timezone.now() - timedelta(days=settings.TMDB_DETAILS_MAX_AGE_DAYS)
+
+
+def stored_movie_details(movie_ids):
+    """
+    {movie_id: details} from the local store only, stale rows included.
+    Never calls TMDb; for paths that must answer fast (see degraded
+    recommendations).
+    """
+    movie_ids = [int(movie_id) for movie_id in movie_ids]
+    return {row.movie_id: row.as_dict() for row in MovieDetails.objects.filter(movie_id__in=movie_ids)}
+
+
+def get_many_movie_details(movie_ids, deadline=None):
+    """
+    Returns {movie_id: details} for the given ids. Served from the local
+    store when fresh; only missing/stale ids go to TMDb, and whatever they
+    return is written back. With a deadline (a time.monotonic() value),
+    TMDb calls are cut short at it and ids not fetched by then are left out.
+    """
+    movie_ids = [int(movie_id) for movie_id in movie_ids]
+    stored = {
+        row.movie_id: row.as_dict()
+        for row in MovieDetails.objects.filter(movie_id__in=movie_ids, fetched_at__gte=fresh_cutoff())
+    }
+    hits = sum(1 for movie_id in movie_ids if movie_id in stored)
+    metrics.CACHE_REQUESTS.inc('tmdb_details', 'hit', amount=hits)
+    metrics.CACHE_REQUESTS.inc('tmdb_details', 'miss', amount=len(movie_ids) - hits)
+
+    fetched = []
+    for movie_id in movie_ids:
+        if movie_id not in stored:
+            timeout = None
+            if deadline is not None:
+                timeout = min(settings.TMDB_TIMEOUT, deadline - time.monotonic())
+                if timeout <= 0:
+                    break
+            details = fetch_movie_details(movie_id, timeout=timeout)
+            if details:
+                stored[movie_id] = details
+                fetched.append(details)
+    if fetched:
+        store_movie_details(fetched)
+    return stored
+
+
+def get_movie_details(movie_id):
+    """Details for one movie, from the local store or TMDb (see get_many_movie_details)."""
+    return get_many_movie_details([movie_id]).get(int(movie_id))
@@ -0,0 +1,38 @@
+# backend/api/upload_handlers.py
+
+"""
+Enforces PROFILE_PICTURE_MAX_UPLOAD_SIZE while the upload is streaming.
+
+ProfileUpdateSerializer can only check a file's size once Django has
+written all of it to memory or disk. ProfilePictureUploadHandler runs
+before the stock handlers (see FILE_UPLOAD_HANDLERS) and stops reading
+the request once the picture passes the limit, so an oversized upload is
+never fully received. It marks the request, and ProfileView answers 413.
+"""
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+
+
+def upload_too_large_message():
+    limit_mb = settings.PROFILE_PICTURE_MAX_UPLOAD_SIZE // (1024 * 1024)
+    return f"Profile pictures must be smaller than {limit_mb} MB."
+
+
+class ProfilePictureUploadHandler(FileUploadHandler):
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        # 'profile_picture', or 'profile.profile_picture' from the nested profile form
+        if self.field_name.split('.')[-1] == 'profile_picture':
+            self.received += len(raw_data)
+            if self.received > settings.PROFILE_PICTURE_MAX_UPLOAD_SIZE:
+                self.request.upload_too_large = True
+                # Don't read (and discard) the rest of the body either
+                raise StopUpload(connection_reset=True)
+        return raw_data  # pass the chunk on to the handler that stores it
+
+    def file_complete(self, file_size):
+        return None
@@ -1,9 +1,9 @@
 from django.urls import path
 from .views import (
     RegisterView, LoginView, LogoutView, CurrentUserView,
-    WatchlistListCreateView, WatchlistDestroyView,
+    WatchlistListCreateView, WatchlistDestroyView, WatchlistSyncView,
     RecommendationView, ProfileView, AdminDashboardStatsView,
-    UserListView, UserDetailView
+    UserListView, UserDetailView, ProfilingView, ProfileDownloadView
 )
 
 urlpatterns = [
@@ -15,6 +15,7 @@ urlpatterns = [
 
     # Watchlist URLS
     path('watchlist/', WatchlistListCreateView.as_view(), name='watchlist-list-create'),
+    path('watchlist/sync/', WatchlistSyncView.as_view(), name='watchlist-sync'),
     path('watchlist/<int:movie_id>/', WatchlistDestroyView.as_view(), name='watchlist-destroy'),
 
     # Recommendation URLS
@@ -27,4 +28,6 @@ urlpatterns = [
     path('admin/stats/', AdminDashboardStatsView.as_view(), name='admin-stats'),
     path('admin/users/', UserListView.as_view(), name='admin-user-list'),
     path('admin/users/<int:pk>/', UserDetailView.as_view(), name='admin-user-detail'),
+    path('admin/profiling/', ProfilingView.as_view(), name='admin-profiling'),
+    path('admin/profiling/<str:name>/', ProfileDownloadView.as_view(), name='admin-profile-download'),
 ]
\ No newline at end of file
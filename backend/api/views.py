@@ -1,5 +1,9 @@
 from django.contrib.auth import login, logout, authenticate
 from django.conf import settings
+from django.http import HttpResponse, FileResponse, Http404
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 import os
 
 
@@ -9,23 +13,56 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
 
-from .serializers import UserSerializer, WatchlistItemSerializer,RegisterSerializer, UserUpdateSerializer, AdminUserUpdateSerializer
+from .serializers import UserSerializer, WatchlistItemSerializer,RegisterSerializer, UserUpdateSerializer, AdminUserUpdateSerializer, WatchlistSyncSerializer, ProfilingArmSerializer
 from .models import WatchlistItem
-from .tmdb_service import get_movie_details
-
+from .upload_handlers import upload_too_large_message
+from .tmdb_service import get_many_movie_details, stored_movie_details
+from .admission import inference_gate, InferenceRejected
+from .lexicon import lexicon_emotion_vector
+from .models import MovieSaveCount
+from .scoring import MANIFEST, ScoringEngine
+from .warmup import record_mood_query
+
+import hashlib
+import hmac
 import pickle
 import numpy as np
 import torch
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 from torch.nn.functional import sigmoid
-from sklearn.metrics.pairwise import cosine_similarity
 
 from django.contrib.auth.models import User
-from django.utils import timezone
-from datetime import timedelta
-from django.db.models import Count
+from django.db import connection, transaction
+from django.db.models import Q
 
 from .permissions import IsAdminUser
+from . import metrics, profiling
+from .pagination import UserCursorPagination
+from . import stats
+
+def load_scoring_engine(movies_df, movie_emotion_matrix):
+    """
+    Similarity search over the emotion matrix. Very large catalogs can be
+    pre-sharded to disk with `manage.py build_scoring_shards` (see
+    api/scoring.py) and are then mmap'd from SCORING_SHARD_DIR.
+    Returns (engine, shard files incl. the manifest, [] when in memory).
+    """
+    shard_files = []
+    if settings.SCORING_SHARD_DIR:
+        engine = ScoringEngine.open(settings.SCORING_SHARD_DIR, workers=settings.SCORING_WORKERS)
+        shard_files = [os.path.join(settings.SCORING_SHARD_DIR, MANIFEST)] + engine.paths
+    else:
+        engine = ScoringEngine.from_matrix(
+            movie_emotion_matrix, shard_rows=settings.SCORING_SHARD_ROWS, workers=settings.SCORING_WORKERS
+        )
+    # Row i of the scores must be row i of movies_df
+    if engine.rows != len(movies_df):
+        engine.close()
+        raise ValueError(
+            f"Scoring matrix has {engine.rows} rows but movies_data.pkl has {len(movies_df)} movies"
+        )
+    return engine, shard_files
+
 
 # ==============================================================================
 #  LOAD ALL ML ASSETS (runs once when the server starts)
@@ -43,6 +80,18 @@ try:
     
     with open(emotion_matrix_path, 'rb') as f:
         movie_emotion_matrix = pickle.load(f)
+
+    scoring_engine, shard_files = load_scoring_engine(movies_df, movie_emotion_matrix)
+    asset_paths = [movies_data_path, emotion_matrix_path] + shard_files
+
+    # The asset version changes whenever the pickles or shard files are
+    # regenerated, which invalidates cached recommendations and HTTP ETags
+    # (see RecommendationView).
+    asset_stats = [os.stat(path) for path in asset_paths]
+    ASSET_LAST_MODIFIED = max(st.st_mtime for st in asset_stats)
+    ASSET_VERSION = hashlib.sha1(
+        repr([(st.st_size, st.st_mtime_ns) for st in asset_stats]).encode()
+    ).hexdigest()[:12]
     
     # --- 2. Load the Hugging Face GoEmotions model for live prediction ---
     MODEL_NAME = "TuhinG/distilbert-goemotions"
@@ -83,10 +132,13 @@ except Exception as e:
 # ==============================================================================
 def extract_user_emotion_vector(text):
     if live_model is None: return np.zeros(7)
-    inputs = tokenizer(text, return_tensors="pt", truncation=True, padding=True, max_length=512)
-    with torch.no_grad():
-        outputs = live_model(**inputs)
-        probs = torch.sigmoid(outputs.logits).cpu().numpy()[0]
+    # Raises InferenceRejected when too many requests are already using the model
+    with inference_gate().admit():
+        with metrics.timer('tokenize'):
+            inputs = tokenizer(text, return_tensors="pt", truncation=True, padding=True, max_length=512)
+        with metrics.timer('model_forward'), torch.no_grad():
+            outputs = live_model(**inputs)
+            probs = torch.sigmoid(outputs.logits).cpu().numpy()[0]
     mapped_vec = [np.mean([probs[j] for j in idxs]) for emo, idxs in emotion_to_indices.items()]
     mapped_vec = np.array(mapped_vec)
     if mapped_vec.sum() > 0:
@@ -109,6 +161,9 @@ class RegisterView(APIView):
 
 
 class ProfileView(generics.RetrieveUpdateAPIView):
+    # Room for the form's other fields and multipart boundaries
+    MAX_FORM_OVERHEAD = 64 * 1024
+
     def get_serializer_class(self):
         if self.request.method in ['PUT', 'PATCH']:
             return UserUpdateSerializer # Correctly uses the update serializer
@@ -117,6 +172,18 @@ class ProfileView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         return self.request.user
 
+    def update(self, request, *args, **kwargs):
+        # Refuse a body that can't hold a valid picture before reading any of it
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+        too_large = content_length > settings.PROFILE_PICTURE_MAX_UPLOAD_SIZE + self.MAX_FORM_OVERHEAD
+        if not too_large:
+            request.data  # parse; ProfilePictureUploadHandler stops an oversized picture
+            too_large = getattr(request, 'upload_too_large', False)
+        if too_large:
+            return Response({"profile_picture": [upload_too_large_message()]},
+                            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        return super().update(request, *args, **kwargs)
+
 class LoginView(APIView):
     permission_classes = [AllowAny]
 
@@ -154,6 +221,17 @@ class CurrentUserView(APIView):
 
 
 
+def lock_watchlist(user):
+    """
+    Serializes watchlist writes for one user until the transaction ends, so
+    "is it already there?" stays true until our INSERT. Takes a row lock on
+    the user; SQLite has no row locks but needs none, since its IMMEDIATE
+    transactions (settings.DATABASES) already take the write lock up front.
+    """
+    if connection.features.has_select_for_update:
+        list(User.objects.select_for_update().filter(pk=user.pk).values_list('pk', flat=True))
+
+
 class WatchlistListCreateView(generics.ListCreateAPIView):
 
     serializer_class = WatchlistItemSerializer
@@ -164,7 +242,10 @@ class WatchlistListCreateView(generics.ListCreateAPIView):
     
     def perform_create(self, serializer):
         # This is also crucial: associate the new item with the current user.
-        serializer.save(user=self.request.user)
+        # The lock needs a transaction, not a savepoint inside one
+        with transaction.atomic(savepoint=False):
+            lock_watchlist(self.request.user)
+            serializer.save(user=self.request.user)
 
 
 class WatchlistDestroyView(generics.DestroyAPIView):
@@ -180,46 +261,230 @@ class WatchlistDestroyView(generics.DestroyAPIView):
         return WatchlistItem.objects.filter(user=self.request.user)
 
 
+class WatchlistSyncView(APIView):
+    """
+    Applies a batch of watchlist adds and removes in a single transaction.
+    Used for importing lists from other services and syncing offline edits.
+
+    Request:  {"add": [{"movie_id", "title", "poster_path"}, ...], "remove": [movie_id, ...]}
+    Response: per-item status for every add ("added" / "exists") and
+              remove ("removed" / "not_found").
+    """
+
+    def post(self, request):
+        serializer = WatchlistSyncSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        adds = serializer.validated_data['add']
+        removes = serializer.validated_data['remove']
+
+        user_items = WatchlistItem.objects.filter(user=request.user)
+        add_ids = [item['movie_id'] for item in adds]
+
+        with transaction.atomic(), stats.batch():
+            # No concurrent write can add one of these movies between the read
+            # below and the INSERT, so "added" items really were inserted
+            lock_watchlist(request.user)
+            # One query to learn what is already there, so we can report per-item status
+            existing = set(
+                user_items.filter(movie_id__in=add_ids + removes).values_list('movie_id', flat=True)
+            )
+
+            # --- Removes: a single filtered DELETE ---
+            if removes:
+                user_items.filter(movie_id__in=removes).delete()
+
+            # --- Adds: a single multi-row INSERT of rows we know are missing ---
+            new_items = [
+                WatchlistItem(user=request.user, **item)
+                for item in adds if item['movie_id'] not in existing
+            ]
+            if new_items:
+                WatchlistItem.objects.bulk_create(new_items)
+                # bulk_create() does not send post_save, so record the adds ourselves
+                stats.record_watchlist_added(new_items)
+
+        results = {
+            'add': [
+                {'movie_id': movie_id, 'status': 'exists' if movie_id in existing else 'added'}
+                for movie_id in add_ids
+            ],
+            'remove': [
+                {'movie_id': movie_id, 'status': 'removed' if movie_id in existing else 'not_found'}
+                for movie_id in removes
+            ],
+        }
+        return Response(results, status=status.HTTP_200_OK)
+
+
+def normalize_mood(text):
+    """Lower-cases and collapses whitespace so trivially different queries share a cache entry."""
+    return " ".join(text.lower().split())
+
+
+def recommendation_cache_key(normalized_mood):
+    digest = hashlib.sha1(normalized_mood.encode()).hexdigest()
+    return f"recommendations:{ASSET_VERSION}:{digest}"
+
+
+def build_recommendations(normalized_mood, deadline=None):
+    """
+    Runs the full pipeline (emotion model -> similarity -> TMDb enrichment)
+    for an already-normalized mood. The result does not depend on the
+    requesting user, so it is safe to share through the cache.
+    Raises InferenceRejected if the model is overloaded.
+    Returns (payload, complete); see rank_and_enrich.
+    """
+    # --- Step 1: Analyze user's mood text ---
+    user_vec = extract_user_emotion_vector(normalized_mood)
+    return rank_and_enrich(user_vec, deadline=deadline)
+
+
+def rank_and_enrich(user_vec, stored_only=False, deadline=None):
+    """
+    Returns (payload, complete). complete is False when some of the top
+    movies got no TMDb details (TMDb down, no API key, ...) and were left
+    out of the payload. With stored_only, details come from the local
+    store alone and TMDb is never called; with a deadline, TMDb calls stop
+    there (see get_many_movie_details).
+    """
+    # --- Step 2: Find similar movies ---
+    with metrics.timer('similarity_topk'):
+        top_indices, top_scores = scoring_engine.top_k(user_vec, 10)
+
+    # This gives us a DataFrame with 'id' and 'title'
+    recommended_movies_base = movies_df.iloc[top_indices]
+
+    # --- Step 3: Enrich the recommendations with live API data ---
+    enriched_recommendations = []
+    with metrics.timer('tmdb_enrichment'):
+        # One local-store query for all ten; only missing/stale ones hit TMDb
+        movie_ids = recommended_movies_base['id'].tolist()
+        if stored_only:
+            all_details = stored_movie_details(movie_ids)
+        else:
+            all_details = get_many_movie_details(movie_ids, deadline=deadline)
+        # .tolist() converts the whole array to Python floats in one C call
+        for movie_id, score in zip(movie_ids, top_scores.tolist()):
+            details = all_details.get(int(movie_id))
+            if details:
+                # *** NEW: Add the similarity score to each movie's details ***
+                details['similarity_score'] = score
+                enriched_recommendations.append(details)
+
+    # --- Step 4: The user's emotion profile for the response ---
+    payload = {
+        "detected_emotion_profile": emotion_profile(user_vec),
+        "recommendations": enriched_recommendations
+    }
+    return payload, len(enriched_recommendations) == len(movie_ids)
+
+
+def emotion_profile(user_vec):
+    emotion_labels = ["joy", "love", "sadness", "fear", "anger", "surprise", "disgust"]
+    return dict(zip(emotion_labels, np.asarray(user_vec, dtype=float).tolist()))
+
+
+def popular_recommendations():
+    """
+    The most-watchlisted movies, used when we can't analyze the mood at
+    all. Details come from the local store only (no TMDb calls).
+    """
+    movie_ids = list(MovieSaveCount.objects.filter(count__gt=0).order_by('-count')
+                     .values_list('movie_id', flat=True)[:10])
+    all_details = stored_movie_details(movie_ids)
+    return [all_details[movie_id] for movie_id in movie_ids if movie_id in all_details]
+
+
 class RecommendationView(APIView):
+    """
+    Responses are deterministic for a given (normalized mood, asset version):
+      - a weak ETag and Last-Modified let browsers revalidate and get a 304
+        without running the model at all;
+      - the payload itself is cached server-side, so a repeat query from any
+        user skips inference and TMDb enrichment.
+    A payload missing some movies' details is only reused for
+    RECOMMENDATION_PARTIAL_CACHE_TIMEOUT and is sent without an ETag, so
+    it is rebuilt soon after TMDb recovers.
+    """
+
     def get(self, request):
         mood_text = request.query_params.get('mood')
-        if not mood_text:
+        if not mood_text or not mood_text.strip():
             return Response({"error": "A 'mood' query parameter is required."}, status=status.HTTP_400_BAD_REQUEST)
         if live_model is None:
             return Response({"error": "Recommendation model is unavailable."}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
-        # --- Step 1: Analyze user's mood text ---
-        user_vec = extract_user_emotion_vector(mood_text)
-        
-        # --- Step 2: Find similar movies ---
-        sims = cosine_similarity(user_vec.reshape(1, -1), movie_emotion_matrix)[0]
-        top_indices = sims.argsort()[::-1][:10]
-        
-        # This gives us a DataFrame with 'id' and 'title'
-        recommended_movies_base = movies_df.iloc[top_indices]
-        
-        # --- Step 3: Enrich the recommendations with live API data ---
-        enriched_recommendations = []
-        for i, movie_id in enumerate(recommended_movies_base['id']):
-            details = get_movie_details(movie_id)
-            if details:
-                # *** NEW: Add the similarity score to each movie's details ***
-                details['similarity_score'] = float(sims[top_indices[i]])
-                enriched_recommendations.append(details)
-
-        # --- Step 4: Prepare the new, detailed response payload ---
-        # *** NEW: Create the user's emotion profile for the response ***
-        emotion_labels = ["joy", "love", "sadness", "fear", "anger", "surprise", "disgust"]
-        user_emotion_profile = {label: float(score) for label, score in zip(emotion_labels, user_vec)}
-        
-        # *** NEW: Combine everything into the final response object ***
-        final_response = {
-            "user_mood_text": mood_text,
-            "detected_emotion_profile": user_emotion_profile,
-            "recommendations": enriched_recommendations
-        }
-            
-        return Response(final_response)
+        normalized_mood = normalize_mood(mood_text)
+        record_mood_query(normalized_mood)
+        cache_key = recommendation_cache_key(normalized_mood)
+        # Weak: the echoed 'user_mood_text' may differ, the recommendations do not
+        etag = "W/" + quote_etag(hashlib.sha1(cache_key.encode()).hexdigest())
+
+        # --- Conditional request: a matching If-None-Match/If-Modified-Since costs nothing ---
+        not_modified = get_conditional_response(request, etag=etag, last_modified=int(ASSET_LAST_MODIFIED))
+        if not_modified is not None:
+            return self.add_cache_headers(not_modified, etag)
+
+        partial_cache_key = f"{cache_key}:partial"
+        cached = cache.get_many([cache_key, partial_cache_key])
+        payload = cached.get(cache_key)
+        complete = payload is not None
+        if payload is None:
+            payload = cached.get(partial_cache_key)
+        metrics.record_cache('recommendations', payload is not None)
+        if payload is None:
+            try:
+                payload, complete = build_recommendations(normalized_mood)
+            except InferenceRejected:
+                return self.degraded_response(mood_text, normalized_mood)
+            if complete:
+                cache.set(cache_key, payload, settings.RECOMMENDATION_CACHE_TIMEOUT)
+            else:
+                cache.set(partial_cache_key, payload, settings.RECOMMENDATION_PARTIAL_CACHE_TIMEOUT)
+
+        response = Response({"user_mood_text": mood_text, **payload})
+        if not complete:
+            patch_cache_control(response, no_store=True)
+            return response
+        return self.add_cache_headers(response, etag)
+
+    @staticmethod
+    def degraded_response(mood_text, normalized_mood):
+        """
+        The model is saturated. Answer from the keyword lexicon if the mood
+        contains a known word, else with the most popular movies; only if
+        neither is possible, send a fast 503 so the client retries later.
+        Degraded answers are never cached and never wait on TMDb: movies
+        without stored details are left out. The 'popular' answer has no
+        detected_emotion_profile, since no emotion was detected.
+        """
+        user_vec = lexicon_emotion_vector(normalized_mood)
+        if user_vec is not None:
+            fallback = 'lexicon'
+            payload, _ = rank_and_enrich(user_vec, stored_only=True)
+        else:
+            fallback = 'popular'
+            payload = {"recommendations": popular_recommendations()}
+
+        if not payload["recommendations"]:
+            metrics.DEGRADED_RESPONSES.inc('unavailable')
+            response = Response({"error": "Recommendations are busy, please retry shortly."},
+                                status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            response['Retry-After'] = str(settings.INFERENCE_RETRY_AFTER)
+            return response
+
+        metrics.DEGRADED_RESPONSES.inc(fallback)
+        response = Response({"user_mood_text": mood_text, "degraded": fallback, **payload})
+        patch_cache_control(response, no_store=True)
+        return response
+
+    @staticmethod
+    def add_cache_headers(response, etag):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(ASSET_LAST_MODIFIED)
+        # The endpoint needs a login, so only the browser (not shared proxies) may store it
+        patch_cache_control(response, private=True, max_age=settings.RECOMMENDATION_HTTP_MAX_AGE)
+        return response
 
 
 # ==============================================================================
@@ -239,32 +504,11 @@ class AdminDashboardStatsView(APIView):
     def get(self, request):
         """
         Handles GET requests to gather and return application statistics.
+        The numbers come from the incrementally maintained aggregate tables
+        (see api/stats.py), so this is a few indexed reads regardless of
+        how many users or watchlist items exist.
         """
-        # --- Query 1: Total number of registered users ---
-        total_users = User.objects.count()
-
-        # --- Query 2: Number of users who registered in the last 7 days ---
-        seven_days_ago = timezone.now() - timedelta(days=7)
-        new_users_last_week = User.objects.filter(date_joined__gte=seven_days_ago).count()
-
-        # --- Query 3: Total number of items added to all watchlists ---
-        total_watchlist_items = WatchlistItem.objects.count()
-
-        # --- Query 4: Top 5 most frequently watchlisted movies ---
-        # This is an aggregation query.
-        top_movies = WatchlistItem.objects.values('title', 'poster_path') \
-            .annotate(count=Count('title')) \
-            .order_by('-count')[:5]
-
-        # Assemble the final data into a dictionary for the JSON response
-        stats = {
-            'total_users': total_users,
-            'new_users_last_week': new_users_last_week,
-            'total_watchlist_items': total_watchlist_items,
-            'top_watchlisted_movies': list(top_movies) # Convert the QuerySet to a list
-        }
-
-        return Response(stats)
+        return Response(stats.dashboard_stats())
 
 
 
@@ -273,11 +517,31 @@ class AdminDashboardStatsView(APIView):
 # ==============================================================================
 class UserListView(generics.ListAPIView):
     """
-    Provides a list of all users. Access is restricted to admin users.
+    Provides a paginated list of all users. Access is restricted to admin users.
+
+    Query parameters:
+      - search:    case-insensitive prefix match on username or email
+      - is_staff:  'true' / 'false'
+      - cursor, page_size: keyset pagination (see UserCursorPagination)
     """
-    queryset = User.objects.all().order_by('-date_joined')
     serializer_class = UserSerializer # Our existing serializer is perfect for this
     permission_classes = [IsAdminUser] # Protected by our admin permission
+    pagination_class = UserCursorPagination
+
+    def get_queryset(self):
+        # select_related avoids one extra profile query per user in the nested serializer
+        queryset = User.objects.select_related('profile')
+
+        search = self.request.query_params.get('search', '').strip()
+        if search:
+            # Prefix matches (rather than "contains") can use the username/email indexes
+            queryset = queryset.filter(Q(username__istartswith=search) | Q(email__istartswith=search))
+
+        is_staff = self.request.query_params.get('is_staff')
+        if is_staff in ('true', 'false'):
+            queryset = queryset.filter(is_staff=(is_staff == 'true'))
+
+        return queryset
 
 
 # ==============================================================================
@@ -297,4 +561,66 @@ class UserDetailView(generics.RetrieveUpdateDestroyAPIView):
             # For viewing, use the detailed serializer with profile info
             return UserSerializer
         # For updating, use the simpler serializer that only allows role changes
-        return AdminUserUpdateSerializer
\ No newline at end of file
+        return AdminUserUpdateSerializer
+
+    def perform_destroy(self, instance):
+        # The cascade deletes the user's watchlist one post_delete at a time;
+        # merge their stats deltas into a few grouped UPDATEs
+        with transaction.atomic(), stats.batch():
+            instance.delete()
+
+
+# ==============================================================================
+#  NEW: ON-DEMAND PROFILER (ADMIN ONLY)
+# ==============================================================================
+class ProfilingView(APIView):
+    """
+    GET:    which endpoints are armed and the stored profiles.
+    POST:   {"endpoint": "recommendations", "requests": 5, "mode": "sampling"}
+            profiles the next N requests to that endpoint (in this worker).
+    DELETE: disarms everything, or only ?endpoint=<name>.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({'armed': profiling.armed(), 'profiles': profiling.list_profiles()})
+
+    def post(self, request):
+        serializer = ProfilingArmSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        profiling.arm(**serializer.validated_data)
+        return Response({'armed': profiling.armed()}, status=status.HTTP_201_CREATED)
+
+    def delete(self, request):
+        profiling.disarm(request.query_params.get('endpoint'))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ProfileDownloadView(APIView):
+    """Downloads one stored profile (.pstats or .collapsed)."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, name):
+        path = profiling.profile_path(name)
+        if path is None:
+            raise Http404
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
+
+
+# ==============================================================================
+#  NEW: PROMETHEUS METRICS ENDPOINT
+# ==============================================================================
+def metrics_view(request):
+    """
+    Serves the in-process metrics (see api/metrics.py) in Prometheus format.
+    Scrapers authenticate with `Authorization: Bearer <METRICS_TOKEN>`;
+    staff users can also open it in a logged-in browser session.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    # Constant-time comparison, so response timing doesn't leak the token
+    authorized_scraper = token and hmac.compare_digest(
+        request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()
+    )
+    if not (authorized_scraper or request.user.is_staff):
+        return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,140 @@
+# backend/api/warmup.py
+
+"""
+Warming the recommendation cache with the most popular moods.
+
+RecommendationView calls `record_mood_query()` for every request. Counts
+are kept in memory and written to MoodQueryStat in one small batch every
+MOOD_LOG_FLUSH_EVERY queries or MOOD_LOG_FLUSH_INTERVAL seconds. The write
+happens in `flush_if_due()`, which runs on request_finished (see
+api/signals.py), i.e. after the response has been sent, so logging never
+adds a query to a response.
+
+`warm_popular_moods()` runs the full pipeline (model, ranking, TMDb
+enrichment) for the top-N moods and stores the payloads in the cache.
+config/wsgi.py calls it before the worker serves its first request. The
+`warm_recommendations` command does the same on demand.
+"""
+
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import MoodQueryStat
+
+MAX_LOGGED_MOOD_LENGTH = 200
+
+_pending = Counter()
+_pending_lock = threading.Lock()
+_last_flush = time.monotonic()
+_flush_due = False
+
+
+def _mood_hash(mood):
+    return hashlib.sha1(mood.encode()).hexdigest()
+
+
+# ==============================================================================
+#  AGGREGATE QUERY LOG
+# ==============================================================================
+def record_mood_query(normalized_mood):
+    """Counts a query in memory; marks a flush as due, but never writes."""
+    global _flush_due
+    if len(normalized_mood) > MAX_LOGGED_MOOD_LENGTH:
+        return  # long free-form text is never going to be "popular"
+    with _pending_lock:
+        _pending[normalized_mood] += 1
+        if sum(_pending.values()) >= settings.MOOD_LOG_FLUSH_EVERY or \
+                time.monotonic() - _last_flush >= settings.MOOD_LOG_FLUSH_INTERVAL:
+            _flush_due = True
+
+
+def flush_if_due(**kwargs):
+    """request_finished receiver: writes the pending counts if a flush is due."""
+    global _flush_due, _last_flush
+    if not _flush_due:
+        return
+    with _pending_lock:
+        if not _flush_due:
+            return  # another thread got there first
+        batch = dict(_pending)
+        _pending.clear()
+        _flush_due = False
+        _last_flush = time.monotonic()
+    try:
+        flush(batch)
+    except Exception as e:
+        print(f"Error flushing mood query counts: {e}")
+
+
+def flush(batch=None):
+    """Writes pending counts to MoodQueryStat (all of them if batch is None)."""
+    if batch is None:
+        with _pending_lock:
+            batch = dict(_pending)
+            _pending.clear()
+    if not batch:
+        return
+    now = timezone.now()
+    with transaction.atomic():
+        MoodQueryStat.objects.bulk_create(
+            [MoodQueryStat(mood_hash=_mood_hash(mood), mood=mood, last_seen=now) for mood in batch],
+            ignore_conflicts=True,
+        )
+        for mood, count in batch.items():
+            MoodQueryStat.objects.filter(mood_hash=_mood_hash(mood)) \
+                .update(count=F('count') + count, last_seen=now)
+
+
+def popular_moods(top_n):
+    return list(MoodQueryStat.objects.order_by('-count').values_list('mood', flat=True)[:top_n])
+
+
+# ==============================================================================
+#  CACHE WARMING
+# ==============================================================================
+def warm_popular_moods(top_n=None, time_budget=None, log=print):
+    """
+    Precomputes and caches recommendations for the top_n most requested
+    moods, stopping once time_budget seconds have passed. TMDb calls are
+    cut short at the same deadline, so an outage can't stretch the budget.
+    Returns a dict with how many moods were warmed, already cached,
+    incomplete and left over.
+    """
+    from . import views  # loads the ML assets
+
+    top_n = settings.RECOMMENDATION_WARMUP_TOP_N if top_n is None else top_n
+    time_budget = settings.RECOMMENDATION_WARMUP_TIME_BUDGET if time_budget is None else time_budget
+    result = {'warmed': 0, 'cached': 0, 'incomplete': 0, 'skipped': 0}
+    if views.live_model is None:
+        log("--- Skipping recommendation warmup: model unavailable ---")
+        return result
+
+    deadline = time.monotonic() + time_budget
+    moods = popular_moods(top_n)
+    for position, mood in enumerate(moods):
+        if time.monotonic() >= deadline:
+            result['skipped'] = len(moods) - position
+            break
+        key = views.recommendation_cache_key(mood)
+        if cache.get(key) is not None:
+            result['cached'] += 1
+            continue
+        payload, complete = views.build_recommendations(mood, deadline=deadline)
+        if not complete:
+            # Missing TMDb details (or out of time); let a live request build it
+            result['incomplete'] += 1
+            continue
+        cache.set(key, payload, settings.RECOMMENDATION_CACHE_TIMEOUT)
+        result['warmed'] += 1
+
+    log(f"--- Recommendation warmup: {result['warmed']} warmed, {result['cached']} already cached, "
+        f"{result['incomplete']} incomplete, {result['skipped']} skipped (time budget) ---")
+    return result
@@ -49,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -57,6 +58,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.ProfilingMiddleware',  # must stay last
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -82,12 +84,94 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=postgresql switches to PostgreSQL (POSTGRES_* variables below);
+# anything else keeps the bundled SQLite file.
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+
+# Seconds a connection is kept open between requests (0 = close after each
+# request). Health checks replace a connection that died while idle.
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', '60'))
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('POSTGRES_DB', 'cinesense'),
+            'USER': os.getenv('POSTGRES_USER', 'cinesense'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+            'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
+            'PORT': os.getenv('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+        }
     }
-}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Wait this many seconds for a lock instead of failing with
+                # "database is locked"
+                'timeout': 20,
+                # Take the write lock when a transaction starts, so two
+                # writers queue up instead of deadlocking on lock upgrade
+                'transaction_mode': 'IMMEDIATE',
+                # Run on every new connection. WAL lets readers work while a
+                # write is in progress; synchronous=NORMAL is still crash-safe
+                # in WAL mode and avoids an fsync per commit.
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA foreign_keys=ON;'
+                    'PRAGMA temp_store=MEMORY;'
+                    'PRAGMA cache_size=-20000;'  # KiB, ~20 MB page cache
+                    'PRAGMA mmap_size=134217728;'  # 128 MB
+                ),
+            },
+        }
+    }
+
+
+# Cache and sessions
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Set REDIS_URL (e.g. redis://localhost:6379/0) to share the cache between
+# worker processes; otherwise each process has its own in-memory cache.
+REDIS_URL = os.getenv('REDIS_URL', '')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+        # Separate key space, so recommendation payloads never evict sessions
+        'sessions': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'session',
+        },
+    }
+    # Sessions are read from the shared cache and only fall back to
+    # django_session on a miss, so most authenticated requests skip the
+    # session query. A logout in one worker is seen by all of them.
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    SESSION_CACHE_ALIAS = 'sessions'
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'cinesense',
+            # Default is 300; leave room for the warmed popular moods
+            'OPTIONS': {'MAX_ENTRIES': 2000},
+        }
+    }
+    # A per-process cache can't hold sessions: a logout (or any session
+    # change) in one worker would stay invisible to the others. Keep the
+    # default database-backed sessions.
 
 
 # Password validation
@@ -151,7 +235,12 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
-    ]
+    ],
+    # orjson-backed JSON when installed (see api/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 # Cookie settings for cross-origin requests
@@ -169,4 +258,93 @@ CSRF_COOKIE_HTTPONLY = True
 MEDIA_URL = '/media/'
 
 # The absolute path to the directory where media files will be stored
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
\ No newline at end of file
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Uploads larger than this are streamed to a temporary file on disk instead
+# of being held in memory.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+
+# Profile pictures (see api/images.py)
+PROFILE_PICTURE_MAX_UPLOAD_SIZE = 5 * 1024 * 1024
+# The first handler stops a picture upload as soon as it passes the limit
+# above (see api/upload_handlers.py); the others are Django's defaults.
+FILE_UPLOAD_HANDLERS = [
+    'api.upload_handlers.ProfilePictureUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+# Variant name -> (width, height); 2x the size they are displayed at
+PROFILE_PICTURE_VARIANTS = {
+    'thumbnail': (80, 80),   # navbar, admin user list
+    'avatar': (160, 160),    # user management modal
+}
+# Render variants on a background thread pool (False = right after the save commits)
+PROFILE_PICTURE_VARIANTS_ASYNC = True
+PROFILE_PICTURE_WORKERS = 2
+
+
+# Metrics / instrumentation (see api/metrics.py and api/middleware.py)
+# --------------------------------------------------------------------------
+# Bearer token Prometheus uses to scrape /metrics (staff sessions work too)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Add a Server-Timing header (total, db, tokenize, model_forward, ...) to
+# every response, visible in the browser's network panel.
+METRICS_SERVER_TIMING = os.getenv('METRICS_SERVER_TIMING', str(DEBUG)) == 'True'
+
+# On-demand profiling of armed endpoints (see api/profiling.py)
+PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')
+PROFILING_SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+PROFILING_MAX_STORED = 50
+
+
+# Recommendation caching (see RecommendationView)
+# --------------------------------------------------------------------------
+# How long a computed recommendation payload is reused server-side. TMDb
+# details inside it can change, so this is bounded rather than forever.
+RECOMMENDATION_CACHE_TIMEOUT = 60 * 60
+# Payloads missing some movies' TMDb details are kept only this long
+RECOMMENDATION_PARTIAL_CACHE_TIMEOUT = 60
+# Cache-Control max-age sent to browsers; after that they revalidate with
+# If-None-Match and usually get a 304.
+RECOMMENDATION_HTTP_MAX_AGE = 5 * 60
+
+# Popular-mood warmup (see api/warmup.py): precompute the top N moods when a
+# worker starts, spending at most TIME_BUDGET seconds on it.
+RECOMMENDATION_WARMUP_ON_START = os.getenv('RECOMMENDATION_WARMUP_ON_START', 'True') == 'True'
+RECOMMENDATION_WARMUP_TOP_N = int(os.getenv('RECOMMENDATION_WARMUP_TOP_N', '50'))
+RECOMMENDATION_WARMUP_TIME_BUDGET = float(os.getenv('RECOMMENDATION_WARMUP_TIME_BUDGET', '30'))
+# Mood query counts are written to the database in batches
+MOOD_LOG_FLUSH_EVERY = 50         # queries
+MOOD_LOG_FLUSH_INTERVAL = 60      # seconds
+
+
+# TMDb (see api/tmdb_service.py); the API key comes from TMDB_API_KEY in .env
+# --------------------------------------------------------------------------
+TMDB_API_BASE_URL = os.getenv('TMDB_API_BASE_URL', 'https://api.themoviedb.org/3')
+TMDB_TIMEOUT = 10  # seconds per request
+# Locally stored details older than this are refetched
+TMDB_DETAILS_MAX_AGE_DAYS = 30
+
+
+# Inference admission control (see api/admission.py)
+# --------------------------------------------------------------------------
+# Requests allowed inside the emotion model at the same time
+INFERENCE_MAX_CONCURRENCY = int(os.getenv('INFERENCE_MAX_CONCURRENCY', '2'))
+# Requests allowed to wait for a slot; beyond this they are shed immediately
+INFERENCE_MAX_QUEUE = int(os.getenv('INFERENCE_MAX_QUEUE', '8'))
+# Longest a request waits for a slot before being shed (seconds)
+INFERENCE_QUEUE_TIMEOUT = 2.0
+# Retry-After (seconds) sent with a 503 when no fallback answer is possible
+INFERENCE_RETRY_AFTER = 5
+
+
+# Similarity scoring (see api/scoring.py)
+# --------------------------------------------------------------------------
+# Rows per shard; shards are scored in parallel by SCORING_WORKERS threads.
+# The bundled catalog fits in a single shard.
+SCORING_SHARD_ROWS = int(os.getenv('SCORING_SHARD_ROWS', '1000000'))
+SCORING_WORKERS = int(os.getenv('SCORING_WORKERS', '4'))
+# Directory of pre-built, mmap'd shard files (ScoringEngine.write_shards);
+# empty = build shards in memory from movie_emotion_matrix.pkl.
+SCORING_SHARD_DIR = os.getenv('SCORING_SHARD_DIR', '')
@@ -14,3 +14,20 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Fill the recommendation cache with the most popular moods before this
+# worker serves its first request (see api/warmup.py).
+from django.conf import settings  # noqa: E402
+
+if settings.RECOMMENDATION_WARMUP_ON_START:
+    from django.db import connections  # noqa: E402
+    from api.warmup import warm_popular_moods  # noqa: E402
+    try:
+        warm_popular_moods()
+    except Exception as e:
+        # A cold cache is slow, not broken: never let warmup stop the worker
+        print(f"--- Recommendation warmup failed: {e} ---")
+    finally:
+        # With a preloading server (gunicorn --preload) this runs before the
+        # fork; workers must not inherit an open database connection.
+        connections.close_all()
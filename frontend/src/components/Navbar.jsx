@@ -84,7 +84,7 @@ const Navbar = () => {
           >
             <span className="absolute inset-0 rounded-full bg-cyan-400 opacity-0 group-hover:opacity-20 blur-md transition-opacity duration-300"></span>
             {isAuthenticated && user?.profile?.profile_picture ? (
-              <img src={user.profile.profile_picture} alt="Profile" className="w-full h-full rounded-full object-cover" />
+              <img src={user.profile.profile_picture_variants?.thumbnail?.webp || user.profile.profile_picture} alt="Profile" className="w-full h-full rounded-full object-cover" />
             ) : (
               <User className="w-5 h-5 text-slate-600" />
             )}
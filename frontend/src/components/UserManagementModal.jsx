@@ -91,7 +91,7 @@ const UserManagementModal = ({ userId, onClose, onUpdate }) => {
             {isLoading ? <p className="text-center py-20 text-slate-500">Loading user details...</p> : userData && (
               <div>
                 <div className="flex items-center space-x-6 pb-6 border-b border-slate-200">
-                    <img src={userData.profile?.profile_picture || `https://ui-avatars.com/api/?name=${userData.username}`} alt={userData.username} className="w-20 h-20 rounded-full object-cover"/>
+                    <img src={userData.profile?.profile_picture_variants?.avatar?.webp || userData.profile?.profile_picture || `https://ui-avatars.com/api/?name=${userData.username}`} alt={userData.username} className="w-20 h-20 rounded-full object-cover"/>
                     <div>
                         <h2 className="text-2xl font-bold text-slate-800">{userData.username}</h2>
                         <p className="text-slate-500">{userData.email || 'No email'}</p>
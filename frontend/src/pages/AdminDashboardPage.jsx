@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useMemo } from 'react';
+import React, { useState, useEffect } from 'react';
 import { getAdminStats, getAllUsers } from '../services/api';
 import { motion } from 'framer-motion';
 import { Users, Heart, Crown, Search, UserPlus } from 'lucide-react';
@@ -26,6 +26,7 @@ const StatCard = ({ title, value, icon, delay }) => (
 const AdminDashboardPage = () => {
     const [stats, setStats] = useState(null);
     const [users, setUsers] = useState([]);
+    const [nextPageUrl, setNextPageUrl] = useState(null);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState('');
     const [searchTerm, setSearchTerm] = useState('');
@@ -39,10 +40,11 @@ const AdminDashboardPage = () => {
             // Fetch stats and user list in parallel for better performance
             const [statsResponse, usersResponse] = await Promise.all([
                 getAdminStats(),
-                getAllUsers()
+                getAllUsers({ search: searchTerm })
             ]);
             setStats(statsResponse.data);
-            setUsers(usersResponse.data);
+            setUsers(usersResponse.data.results);
+            setNextPageUrl(usersResponse.data.next);
         } catch (err) {
             setError('Could not load dashboard data. Please try again later.');
             console.error("Failed to fetch admin data", err);
@@ -54,14 +56,32 @@ const AdminDashboardPage = () => {
         fetchAllAdminData().finally(() => setLoading(false));
     }, []);
 
-    // Memoized filtering for the user table to optimize performance
-    const filteredUsers = useMemo(() => {
-        if (!searchTerm) return users;
-        return users.filter(user => 
-            user.username.toLowerCase().includes(searchTerm.toLowerCase()) ||
-            (user.email && user.email.toLowerCase().includes(searchTerm.toLowerCase()))
-        );
-    }, [users, searchTerm]);
+    // Search runs on the server (prefix match on username/email), debounced
+    useEffect(() => {
+        if (loading) return;
+        const timer = setTimeout(async () => {
+            try {
+                const response = await getAllUsers({ search: searchTerm });
+                setUsers(response.data.results);
+                setNextPageUrl(response.data.next);
+            } catch (err) {
+                console.error("Failed to search users", err);
+            }
+        }, 300);
+        return () => clearTimeout(timer);
+    }, [searchTerm]);
+
+    const loadMoreUsers = async () => {
+        if (!nextPageUrl) return;
+        try {
+            const cursor = new URL(nextPageUrl).searchParams.get('cursor');
+            const response = await getAllUsers({ search: searchTerm, cursor });
+            setUsers(prev => [...prev, ...response.data.results]);
+            setNextPageUrl(response.data.next);
+        } catch (err) {
+            console.error("Failed to load more users", err);
+        }
+    };
     
     // This function is passed to the modal. When the modal performs an action
     // (like deleting or updating a user), it calls this function to trigger a data refresh.
@@ -134,11 +154,11 @@ const AdminDashboardPage = () => {
                                 </tr>
                             </thead>
                             <tbody>
-                                {filteredUsers.map(user => (
+                                {users.map(user => (
                                     <tr key={user.id} className="hover:bg-slate-100/50 transition-colors duration-200">
                                         <td className="p-4">
                                             <div className="flex items-center">
-                                                <img src={user.profile?.profile_picture || `https://ui-avatars.com/api/?name=${user.username}&background=random`} alt={user.username} className="w-10 h-10 rounded-full object-cover mr-4"/>
+                                                <img src={user.profile?.profile_picture_variants?.thumbnail?.webp || user.profile?.profile_picture || `https://ui-avatars.com/api/?name=${user.username}&background=random`} alt={user.username} className="w-10 h-10 rounded-full object-cover mr-4"/>
                                                 <div>
                                                     <p className="font-semibold text-slate-800">{user.username}</p>
                                                     <p className="text-sm text-slate-500 truncate">{user.email || 'No email'}</p>
@@ -165,6 +185,13 @@ const AdminDashboardPage = () => {
                             </tbody>
                         </table>
                     </div>
+                    {nextPageUrl && (
+                        <div className="flex justify-center mt-4">
+                            <button onClick={loadMoreUsers} className="text-cyan-600 hover:underline text-sm font-semibold">
+                                Load more users
+                            </button>
+                        </div>
+                    )}
                 </motion.div>
             </motion.div>
 
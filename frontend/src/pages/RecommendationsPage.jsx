@@ -62,11 +62,14 @@ const RecommendationsPage = () => {
     );
   }
 
-  const { detected_emotion_profile, recommendations } = results;
+  // 'degraded' is set when the AI was too busy: 'lexicon' = quick keyword
+  // analysis, 'popular' = most-saved movies with no emotion profile at all
+  const { detected_emotion_profile, recommendations, degraded } = results;
+  const emotionProfile = detected_emotion_profile || {};
   const visibleMovies = recommendations.slice(0, visibleCount);
 
   // Get the top 3 emotions for a quick summary
-  const topEmotions = Object.entries(detected_emotion_profile)
+  const topEmotions = Object.entries(emotionProfile)
     .sort(([, a], [, b]) => b - a)
     .slice(0, 3)
     .map(e => e[0]);
@@ -85,21 +88,33 @@ const RecommendationsPage = () => {
           <h1 className="text-4xl md:text-5xl font-bold text-slate-800 leading-tight mt-2">
             "{results.user_mood_text}"
           </h1>
-          <p className="mt-4 text-slate-600">
-            We found these movies with vibes of <span className="font-semibold text-cyan-600">{topEmotions.join(', ')}</span>, and more.
-          </p>
+          {topEmotions.length > 0 ? (
+            <p className="mt-4 text-slate-600">
+              We found these movies with vibes of <span className="font-semibold text-cyan-600">{topEmotions.join(', ')}</span>, and more.
+            </p>
+          ) : (
+            <p className="mt-4 text-slate-600">
+              Our AI is busy right now, so here are the movies everyone is saving. Try again in a moment for picks tailored to your mood.
+            </p>
+          )}
+          {degraded === 'lexicon' && (
+            <p className="mt-2 text-sm text-slate-500">
+              Our AI is busy right now, so this is a quick keyword-based match. Try again in a moment for sharper picks.
+            </p>
+          )}
         </motion.div>
 
         {/* --- Right Side: AI Analysis Card --- */}
+        {topEmotions.length > 0 && (
         <motion.div 
           className="bg-white/60 backdrop-blur-sm p-6 rounded-xl border border-slate-200/80"
           initial={{ opacity: 0, x: 20 }}
           animate={{ opacity: 1, x: 0 }}
           transition={{ duration: 0.5, delay: 0.2 }}
         >
-          <h2 className="font-bold text-slate-700 mb-3">AI Emotion Analysis</h2>
+          <h2 className="font-bold text-slate-700 mb-3">{degraded ? 'Quick Emotion Analysis' : 'AI Emotion Analysis'}</h2>
           <div className="space-y-2">
-            {Object.entries(detected_emotion_profile).sort(([,a],[,b]) => b-a).map(([emotion, score]) => (
+            {Object.entries(emotionProfile).sort(([,a],[,b]) => b-a).map(([emotion, score]) => (
               <div key={emotion} className="w-full">
                 <div className="flex justify-between text-sm mb-1">
                   <span className="capitalize font-medium text-slate-600">{emotion}</span>
@@ -117,6 +132,7 @@ const RecommendationsPage = () => {
             ))}
           </div>
         </motion.div>
+        )}
       </div>
 
       {/* --- Movie Grid --- */}
@@ -59,6 +59,12 @@ export const removeFromWatchlist = (movieId) => {
   return apiClient.delete(`/watchlist/${movieId}/`);
 };
 
+// Applies many adds/removes in one request, e.g. when importing a list.
+// changes = { add: [{ movie_id, title, poster_path }], remove: [movie_id] }
+export const syncWatchlist = (changes) => {
+  return apiClient.post('/watchlist/sync/', changes);
+};
+
 export const getProfile = () => {
   return apiClient.get('/profile/');
 };
@@ -86,8 +92,10 @@ export const getAdminStats = () => {
   return apiClient.get('/admin/stats/');
 };
 
-export const getAllUsers = () => {
-  return apiClient.get('/admin/users/');
+// Paginated: resolves to { next, previous, results }.
+// params can include { search, is_staff, cursor, page_size }.
+export const getAllUsers = (params = {}) => {
+  return apiClient.get('/admin/users/', { params });
 };
 
 export const getUserById = (userId) => {